@@ -0,0 +1,97 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""Microbenchmarks of the per file cost of validating the first line of a header.
+
+Run with ``python -m benchmarks.header_matcher [n_lines]`` from the root of the
+repository.
+"""
+
+import re
+import sys
+import timeit
+
+from head_of_apache.main import (
+    DESIRED_LICENSE_NOTICE,
+    HEADER_MATCHER,
+    SINGLE_DATE_LICENSE_NOTICE,
+    parse_license_years,
+    validate_file_header,
+    validate_headers,
+)
+
+AUTHOR = "person"
+CURRENT_YEAR = "2026"
+LINES = [
+    f"# Copyright 2023 - 2026 {AUTHOR}\n",
+    f"# Copyright 2023 - 2025 {AUTHOR}\n",
+    f"# Copyright 2023 {AUTHOR}\n",
+    f"# Copyright 2023-2026 {AUTHOR}\n",
+    "# Copyright 2023 - present someone else\n",
+    "#!/usr/bin/env python\n",
+    "import os\n",
+    "<!-- Copyright 2020 - 2026 person -->\n",
+]
+
+
+def search_twice(first_line):
+    """The notice search before ``HeaderMatcher``: one ``re.search`` per form."""
+    license_notice = re.search(DESIRED_LICENSE_NOTICE, first_line)
+    if not license_notice:
+        license_notice = re.search(SINGLE_DATE_LICENSE_NOTICE, first_line)
+    if license_notice:
+        return license_notice.group("author"), *parse_license_years(
+            license_notice.group("years")
+        )
+    return None
+
+
+def old_validate_file_header(first_line, current_year, author, last_year_present):
+    license_notice = search_twice(first_line)
+    if license_notice is None or license_notice[0] != author:
+        end_year = current_year if not last_year_present else "present"
+        return False, True, current_year, end_year
+    _, start_year, end_year, wrong_space_format = license_notice
+    if (end_year != current_year and not last_year_present) or (
+        end_year != "present" and last_year_present
+    ):
+        end_year = current_year if not last_year_present else "present"
+        return True, True, start_year, end_year
+    return True, wrong_space_format, start_year, end_year
+
+
+def main(n_lines=100_000, repeat=7):
+    lines = (LINES * (n_lines // len(LINES) + 1))[:n_lines]
+    byte_lines = [line.encode() for line in lines]
+    args = (CURRENT_YEAR, AUTHOR, False)
+    cases = {
+        "re.search twice": lambda: [search_twice(line) for line in lines],
+        "HeaderMatcher.match": lambda: [HEADER_MATCHER.match(line) for line in lines],
+        "HeaderMatcher.match_bytes": lambda: [
+            HEADER_MATCHER.match_bytes(line) for line in byte_lines
+        ],
+        "old validate_file_header": lambda: [
+            old_validate_file_header(line, *args) for line in lines
+        ],
+        "validate_file_header": lambda: [
+            validate_file_header(line, *args) for line in lines
+        ],
+        "validate_headers": lambda: validate_headers(lines, *args),
+    }
+    for name, case in cases.items():
+        seconds = min(timeit.repeat(case, number=1, repeat=repeat))
+        print(f"{name:>26}: {seconds / n_lines * 1e9:8.1f} ns per file")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
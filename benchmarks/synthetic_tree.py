@@ -0,0 +1,87 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""Generator of reproducible synthetic source trees for the benchmarks."""
+
+import os
+import random
+
+from head_of_apache.main import COMMENT_STYLES, FILE_TYPE_MAPPING
+from tests import utils
+from tests.utils import bad_fnames, good_fnames
+
+# Suffixes of files that are found while walking the tree, but are never checked.
+OTHER_SUFFIXES = ["txt", "png", "json", "lock"]
+
+
+def _directory(index, width, deep_every, deep_depth):
+    """Spread the directories over a tree with ``width`` children per directory."""
+    parts = ["deep"] * deep_depth if index % deep_every == deep_every - 1 else []
+    while True:
+        index, digit = divmod(index, width)
+        parts.append(f"dir_{digit}")
+        if not index:
+            break
+    return os.path.join(*reversed(parts))
+
+
+def generate_tree(
+    root,
+    n_files,
+    seed=0,
+    files_per_directory=50,
+    width=8,
+    deep_every=97,
+    deep_depth=20,
+    other_ratio=0.1,
+    large_ratio=0.001,
+    large_size=1 << 20,
+):
+    """Write ``n_files`` files below ``root`` and return the number of checked ones.
+
+    The same arguments always produce the same tree. Files have a random suffix of
+    ``FILE_TYPE_MAPPING``, and a random content among the good and bad files of
+    ``tests.utils``, with the matching comment style. A fraction ``other_ratio`` of
+    the files have a suffix that is not checked, and a fraction ``large_ratio`` of
+    the checked files get a body of ``large_size`` bytes. Every ``deep_every``
+    directory is nested ``deep_depth`` levels further.
+    """
+    rng = random.Random(seed)
+    suffixes = sorted(FILE_TYPE_MAPPING)
+    fnames = good_fnames + bad_fnames
+    contents = {}
+    n_checked = 0
+    for start in range(0, n_files, files_per_directory):
+        directory = os.path.join(
+            root,
+            _directory(start // files_per_directory, width, deep_every, deep_depth),
+        )
+        os.makedirs(directory, exist_ok=True)
+        for i in range(start, min(start + files_per_directory, n_files)):
+            if rng.random() < other_ratio:
+                suffix = rng.choice(OTHER_SUFFIXES)
+                content = b"Not a source file\n"
+            else:
+                n_checked += 1
+                suffix = rng.choice(suffixes)
+                fname = rng.choice(fnames)
+                key = (fname, FILE_TYPE_MAPPING[suffix])
+                if key not in contents:
+                    comment_style = COMMENT_STYLES[key[1]]
+                    contents[key] = getattr(utils, fname)(**comment_style).encode()
+                content = contents[key]
+                if rng.random() < large_ratio:
+                    content += b"x = 1\n" * (large_size // 6)
+            with open(os.path.join(directory, f"file_{i}.{suffix}"), "wb") as f:
+                f.write(content)
+    return n_checked
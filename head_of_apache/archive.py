@@ -0,0 +1,130 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""Check the license headers of the files inside of release archives.
+
+Source distributions and tarballs are read as a stream, in a single sequential
+pass, whatever their compression. Zip archives and wheels keep their table of
+contents at the end, so their members are looked up in it, and only the start of
+each member is decompressed. Nothing is ever extracted to disk, and at most
+``HEADER_READ_BUDGET`` bytes of a member are held in memory.
+"""
+
+import os
+import sys
+import tarfile
+import zipfile
+
+from .exclude import DEFAULT_EXCLUDES, ExcludeMatcher
+from .main import (
+    COMMENT_STYLES,
+    HEADER_READ_BUDGET,
+    Settings,
+    _check_buffer,
+    _current_year,
+    _merge_mapping,
+    _outcome,
+    _report,
+)
+
+
+class ArchiveError(Exception):
+    """Raised when an archive cannot be read."""
+
+
+def _is_checked(name, file_type_mapping, matcher):
+    """Whether the member ``name`` of an archive must be checked.
+
+    The same suffix, hidden file and exclusion rules as for the files of a
+    directory are applied, as if the archive was extracted in the current working
+    directory.
+    """
+    parts = [part for part in name.split("/") if part not in ("", ".")]
+    if not parts or os.path.splitext(parts[-1])[1][1:] not in file_type_mapping:
+        return False
+    if any(part.startswith(".") for part in parts):
+        return False
+    return not matcher.is_excluded("/".join(parts), os.curdir)
+
+
+def _iter_tar(archive):
+    with tarfile.open(archive, mode="r|*") as tar:
+        for member in tar:
+            if member.isfile():
+                yield member.name, tar.extractfile(member)
+
+
+def _iter_zip(archive):
+    with zipfile.ZipFile(archive) as zip_file:
+        for info in zip_file.infolist():
+            if not info.is_dir():
+                with zip_file.open(info) as f:
+                    yield info.filename, f
+
+
+def iter_members(archive):
+    """Yield the ``(name, file)`` of the regular files in ``archive``.
+
+    Each ``file`` can only be read until the next member is yielded.
+    """
+    if zipfile.is_zipfile(archive):
+        return _iter_zip(archive)
+    return _iter_tar(archive)
+
+
+def check_archives(
+    archives,
+    author,
+    mapping=None,
+    exclude=None,
+    last_year_present=False,
+    start_year_override=None,
+    use_default_excludes=True,
+    minified="insert",
+):
+    """Report the members of ``archives`` that lack a correct license header.
+
+    Members are named ``<archive>:<name>`` in the messages, and nothing is written.
+    Returns 1 if a header is missing or outdated, 0 otherwise. Raises an
+    ``ArchiveError`` if an archive cannot be read.
+    """
+    file_type_mappings = _merge_mapping(mapping)
+    matcher = ExcludeMatcher(
+        exclude, default_excludes=DEFAULT_EXCLUDES if use_default_excludes else None
+    )
+    settings = Settings(
+        author=author,
+        current_year=_current_year(),
+        dry_run=True,
+        last_year_present=last_year_present,
+        start_year_override=start_year_override,
+        minified=minified,
+    )
+    exit_status = 0
+    for archive in archives:
+        try:
+            for name, f in iter_members(archive):
+                if not _is_checked(name, file_type_mappings, matcher):
+                    continue
+                file = f"{archive}:{name}"
+                style = file_type_mappings[os.path.splitext(name)[1][1:]]
+                check = _check_buffer(
+                    f.read(HEADER_READ_BUDGET), file, COMMENT_STYLES[style], settings
+                )
+                result = _report(file, _outcome(check), settings)
+                exit_status = max(exit_status, result.exit_status)
+                for message in result.messages:
+                    print(message, file=sys.stdout)
+        except (OSError, EOFError, tarfile.TarError, zipfile.BadZipFile) as e:
+            raise ArchiveError(f"Cannot read the archive '{archive}': {e}") from e
+    return exit_status
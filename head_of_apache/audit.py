@@ -0,0 +1,138 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""Audit of the license headers of past revisions, without checking them out.
+
+The files of every revision are listed from its git tree, and the start of their
+content is read from the object database through a single ``git cat-file --batch``
+process (see ``head_of_apache.git.BlobReader``). Files with the same content are
+only read and checked once, however many revisions they appear in.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+from . import git
+from .exclude import DEFAULT_EXCLUDES, ExcludeMatcher
+from .main import (
+    COMMENT_STYLES,
+    HEADER_READ_BUDGET,
+    Settings,
+    _blob_kind,
+    _check_buffer,
+    _filter_tracked,
+    _merge_mapping,
+    _outcome,
+    _outermost_paths,
+    _report,
+)
+
+
+def _iter_tree_files(directory, ref, pathspec, file_type_mapping, matcher):
+    """Yield the ``(path, object_name)`` of the files of ``ref`` below ``directory``
+    that must be checked.
+    """
+    relative_paths = []
+    object_names = {}
+    for mode, object_name, relative_path in git.iter_tree(directory, ref, pathspec):
+        if mode not in (git.GITLINK_MODE, git.SYMLINK_MODE):
+            relative_paths.append(relative_path)
+            object_names[os.path.join(directory, relative_path)] = object_name
+    for path in _filter_tracked(directory, relative_paths, file_type_mapping, matcher):
+        yield path, object_names[path]
+
+
+def audit(
+    paths,
+    refs,
+    author,
+    mapping=None,
+    exclude=None,
+    last_year_present=False,
+    start_year_override=None,
+    use_default_excludes=True,
+    minified="insert",
+):
+    """Report the files below ``paths`` that lack a correct header in each of ``refs``.
+
+    The files are those of the git trees of the ``refs``, filtered with the same
+    rules as the ``git`` discovery of ``head_of_apache.main.get_files``, and nothing
+    is written. A header is up to date if it covers the year of the commit that a
+    ref points to. Files are named ``<ref>:<path>`` in the messages, which are
+    printed ref by ref. Returns 1 if a header is missing or outdated, 0 otherwise.
+    Raises a ``GitError`` if a path is not inside a git working tree or a ref is
+    not a valid revision.
+    """
+    file_type_mappings = _merge_mapping(mapping)
+    matcher = ExcludeMatcher(
+        exclude, default_excludes=DEFAULT_EXCLUDES if use_default_excludes else None
+    )
+    settings = Settings(
+        author=author,
+        current_year=None,
+        dry_run=True,
+        last_year_present=last_year_present,
+        start_year_override=start_year_override,
+        minified=minified,
+    )
+    directories = []
+    for path in _outermost_paths(paths):
+        if os.path.isdir(path):
+            directories.append((path, ()))
+        else:
+            directory, name = os.path.split(path)
+            directories.append((directory or os.curdir, [f":(literal){name}"]))
+
+    # Outcomes by object name, kind of file and year, and one reader per repository.
+    outcomes = {}
+    readers = {}
+    exit_status = 0
+    try:
+        for ref in refs:
+            for directory, pathspec in directories:
+                ref_settings = settings._replace(
+                    current_year=str(git.commit_year(directory, ref))
+                )
+                root = git.toplevel(directory)
+                if root not in readers:
+                    readers[root] = git.BlobReader(root)
+                reader = readers[root]
+                for path, object_name in _iter_tree_files(
+                    directory, ref, pathspec, file_type_mappings, matcher
+                ):
+                    file = Path(path)
+                    style = file_type_mappings[file.suffix[1:]]
+                    name = f"{ref}:{path}"
+                    key = (
+                        object_name,
+                        _blob_kind(file, style),
+                        ref_settings.current_year,
+                    )
+                    outcome = outcomes.get(key)
+                    if outcome is None:
+                        check = _check_buffer(
+                            reader.read_prefix(object_name, HEADER_READ_BUDGET),
+                            name,
+                            COMMENT_STYLES[style],
+                            ref_settings,
+                        )
+                        outcome = outcomes[key] = _outcome(check)
+                    result = _report(name, outcome, ref_settings)
+                    exit_status = max(exit_status, result.exit_status)
+                    for message in result.messages:
+                        print(message, file=sys.stdout)
+    finally:
+        for reader in readers.values():
+            reader.close()
+    return exit_status
@@ -0,0 +1,277 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import os
+import time
+
+DEFAULT_CACHE_DIR = ".head_of_apache_cache"
+CACHE_FILE = "results.sqlite3"
+# Entries stored under other options (e.g. a past year) are dropped once these
+# options have not been used for this long.
+MAX_FINGERPRINT_AGE = 30 * 24 * 60 * 60
+# Number of cached paths checked for deletion at the end of each run.
+SWEEP_SIZE = 256
+# Files modified this recently are not cached, because a later change in the same
+# file system timestamp tick could keep the same size and modification time.
+RACY_WINDOW_NS = 2 * 10**9
+# Number of new entries buffered before they are written.
+WRITE_BATCH_SIZE = 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    fingerprint TEXT PRIMARY KEY,
+    last_used INTEGER NOT NULL,
+    sweep_position TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS results (
+    fingerprint TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    outcome INTEGER NOT NULL,
+    PRIMARY KEY (fingerprint, path)
+) WITHOUT ROWID;
+"""
+
+
+def fingerprint(**options):
+    """Hash the options that determine the outcome of a header check."""
+    import hashlib
+    import json
+
+    encoded = json.dumps(options, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def stat_key(path_stat):
+    return path_stat.st_size, path_stat.st_mtime_ns, path_stat.st_ino
+
+
+class ResultCache:
+    """On disk cache of header check outcomes, keyed by path and ``stat`` results.
+
+    The outcome of a file is stored with its size, modification time and inode, and
+    is only reused while they are unchanged. Entries are also scoped by a
+    ``fingerprint`` of the options that affect the outcome, so changing the author,
+    the year policy, the mapping or the current year invalidates them. Any database
+    error disables the cache for the rest of the run instead of failing it.
+    """
+
+    # sqlite3 is imported by the methods that use it, so that runs without a cache
+    # do not load it.
+    def __init__(self, directory, fingerprint):
+        import sqlite3
+
+        self.fingerprint = fingerprint
+        self._pending = []
+        os.makedirs(directory, exist_ok=True)
+        gitignore = os.path.join(directory, ".gitignore")
+        if not os.path.exists(gitignore):
+            with open(gitignore, "w") as f:
+                f.write("# Created by head_of_apache.\n*\n")
+        self._connection = sqlite3.connect(
+            os.path.join(directory, CACHE_FILE), timeout=5
+        )
+        try:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(_SCHEMA)
+            now = int(time.time())
+            with self._connection:
+                self._connection.execute(
+                    "INSERT INTO fingerprints (fingerprint, last_used) VALUES (?, ?) "
+                    "ON CONFLICT (fingerprint) DO UPDATE SET last_used = ?",
+                    (fingerprint, now, now),
+                )
+                self._evict_fingerprints(now - MAX_FINGERPRINT_AGE)
+        except sqlite3.Error:
+            self._disable()
+
+    @classmethod
+    def open(cls, directory, fingerprint):
+        """Open the cache in ``directory``, or return ``None`` if that fails."""
+        import sqlite3
+
+        try:
+            return cls(directory, fingerprint)
+        except (OSError, sqlite3.Error):
+            return None
+
+    def _disable(self):
+        if self._connection is not None:
+            self._connection.close()
+        self._connection = None
+        self._pending = []
+
+    def _evict_fingerprints(self, oldest):
+        stale = [
+            row[0]
+            for row in self._connection.execute(
+                "SELECT fingerprint FROM fingerprints WHERE last_used < ?", (oldest,)
+            )
+        ]
+        for stale_fingerprint in stale:
+            self._connection.execute(
+                "DELETE FROM results WHERE fingerprint = ?", (stale_fingerprint,)
+            )
+            self._connection.execute(
+                "DELETE FROM fingerprints WHERE fingerprint = ?", (stale_fingerprint,)
+            )
+
+    def get(self, path, key):
+        """Return the cached outcome of ``path`` if its ``stat_key`` is unchanged."""
+        import sqlite3
+
+        if self._connection is None:
+            return None
+        try:
+            row = self._connection.execute(
+                "SELECT size, mtime_ns, inode, outcome FROM results "
+                "WHERE fingerprint = ? AND path = ?",
+                (self.fingerprint, os.path.abspath(path)),
+            ).fetchone()
+        except sqlite3.Error:
+            self._disable()
+            return None
+        if row is None or tuple(row[:3]) != tuple(key):
+            return None
+        return row[3]
+
+    def put(self, path, key, outcome):
+        """Store the outcome of ``path``, whose ``stat_key`` is ``key``."""
+        if self._connection is None:
+            return
+        if time.time_ns() - key[1] < RACY_WINDOW_NS:
+            return
+        self._pending.append((self.fingerprint, os.path.abspath(path), *key, outcome))
+        if len(self._pending) >= WRITE_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        import sqlite3
+
+        if self._connection is None or not self._pending:
+            return
+        try:
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO results "
+                    "(fingerprint, path, size, mtime_ns, inode, outcome) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    self._pending,
+                )
+        except sqlite3.Error:
+            self._disable()
+        self._pending = []
+
+    def sweep(self, size=SWEEP_SIZE):
+        """Drop the entries of deleted files, checking ``size`` paths per call.
+
+        Successive calls resume where the previous one stopped, so the whole cache
+        is eventually checked without ever paying for a full scan in a single run.
+        """
+        import sqlite3
+
+        if self._connection is None:
+            return
+        try:
+            with self._connection:
+                (position,) = self._connection.execute(
+                    "SELECT sweep_position FROM fingerprints WHERE fingerprint = ?",
+                    (self.fingerprint,),
+                ).fetchone()
+                paths = [
+                    row[0]
+                    for row in self._connection.execute(
+                        "SELECT path FROM results WHERE fingerprint = ? AND path > ? "
+                        "ORDER BY path LIMIT ?",
+                        (self.fingerprint, position, size),
+                    )
+                ]
+                self._connection.executemany(
+                    "DELETE FROM results WHERE fingerprint = ? AND path = ?",
+                    [
+                        (self.fingerprint, path)
+                        for path in paths
+                        if not os.path.exists(path)
+                    ],
+                )
+                self._connection.execute(
+                    "UPDATE fingerprints SET sweep_position = ? WHERE fingerprint = ?",
+                    (paths[-1] if len(paths) == size else "", self.fingerprint),
+                )
+        except sqlite3.Error:
+            self._disable()
+
+    def close(self):
+        self.flush()
+        self.sweep()
+        self._disable()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class BlobCache:
+    """Content addressed cache of header check outcomes, shared between runs.
+
+    Outcomes are keyed by the git object name of the content of a file, so they are
+    valid for any copy of that content, in any clone, worktree or machine. Each entry
+    is a small file ``<fingerprint>/<object_name[:2]>/<object_name[2:]>-<kind>``
+    holding the outcome, where ``kind`` accounts for what else than the content
+    affects the check, like the comment style. Entries never change once written,
+    and they are renamed into place, so several runs can share the directory
+    without any locking, and it can be archived and restored as a whole. With
+    ``read_only``, or if the directory cannot be written, entries are only read.
+    """
+
+    def __init__(self, directory, fingerprint, read_only=False):
+        self.directory = os.path.join(directory, fingerprint)
+        self.read_only = read_only
+
+    def _path(self, object_name, kind):
+        return os.path.join(
+            self.directory, object_name[:2], f"{object_name[2:]}-{kind}"
+        )
+
+    def get(self, object_name, kind):
+        """Return the cached outcome of a content, or ``None``."""
+        try:
+            with open(self._path(object_name, kind), "rb") as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def put(self, object_name, kind, outcome):
+        """Store the outcome of a content, unless the cache is read only."""
+        if self.read_only:
+            return
+        import tempfile
+
+        path = self._path(object_name, kind)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(b"%d" % outcome)
+                os.replace(tmp_path, path)
+            except OSError:
+                os.remove(tmp_path)
+                raise
+        except OSError:
+            self.read_only = True
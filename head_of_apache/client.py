@@ -0,0 +1,108 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""Thin client of a ``head_of_apache --serve`` server.
+
+This module does not import the rest of the package, so asking a running server
+to check a few files only costs the start of the interpreter and a round trip
+over its Unix socket.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+
+# Same as head_of_apache.server.DEFAULT_SOCKET, which is not imported to start fast.
+DEFAULT_SOCKET = ".head_of_apache.sock"
+
+
+class ServerError(Exception):
+    """Raised when the server cannot be reached or cannot answer a request."""
+
+
+def request(socket_path=DEFAULT_SOCKET, command="check", **arguments):
+    """Send a request to the server listening at ``socket_path``, and return its
+    decoded response.
+
+    For the "check" command, ``paths`` is the list of files and directories to
+    check, all the served paths by default, and ``dry_run`` whether to only report
+    the files that must be fixed. The "stop" command stops the server.
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(os.fspath(socket_path))
+            message = json.dumps({"command": command, **arguments}).encode()
+            connection.sendall(message + b"\n")
+            with connection.makefile("rb") as stream:
+                response = json.loads(stream.readline())
+    except (OSError, ValueError) as e:
+        raise ServerError(
+            f"Could not reach a head_of_apache server at '{socket_path}': {e}"
+        ) from e
+    if "error" in response:
+        raise ServerError(response["error"])
+    return response
+
+
+parser = argparse.ArgumentParser(
+    prog="head_of_apache.client",
+    description=(
+        "Check license headers through a running 'head_of_apache --serve' server."
+    ),
+)
+parser.add_argument(
+    "--socket",
+    default=DEFAULT_SOCKET,
+    help=f"Path of the socket of the server. Defaults to '{DEFAULT_SOCKET}'.",
+)
+parser.add_argument(
+    "-d",
+    "--dry-run",
+    action="store_true",
+    help="Notify about missing license headers, but do not apply them.",
+)
+parser.add_argument(
+    "--stop",
+    action="store_true",
+    help="Stop the server.",
+)
+parser.add_argument(
+    "paths",
+    nargs="*",
+    help="Files and directories to check. Defaults to all the served paths.",
+)
+
+
+def main(args=None):
+    parsed_args = parser.parse_args(args)
+    try:
+        if parsed_args.stop:
+            request(parsed_args.socket, "stop")
+            return 0
+        response = request(
+            parsed_args.socket,
+            paths=[os.path.abspath(path) for path in parsed_args.paths],
+            dry_run=parsed_args.dry_run,
+        )
+    except ServerError as e:
+        print(e, file=sys.stderr)
+        return 2
+    for message in response["messages"]:
+        print(message, file=sys.stdout)
+    return response["exit_status"]
+
+
+if __name__ == "__main__":
+    sys.exit(main())  # pragma: no cover
@@ -0,0 +1,187 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""Library interface to check and fix license headers from other programs."""
+
+import os
+
+from .main import (
+    COMMENT_STYLES,
+    OUTCOME_FIXED,
+    Result,
+    Settings,
+    _check_buffer,
+    _check_file,
+    _current_year,
+    _finish_check,
+    _fix_buffer,
+    _fixed_message,
+    _merge_mapping,
+    _needs_fix,
+    _outcome,
+    _report,
+    render_license_header,
+)
+
+# Text buffers are checked as their UTF-8 encoding, and the surrogates that
+# stand for undecodable bytes are encoded back into those bytes.
+TEXT_ENCODING = "utf-8"
+TEXT_ERRORS = "surrogateescape"
+
+
+class HeaderEngine:
+    """Check and fix license headers with options that are set up once.
+
+    The arguments have the same meaning as for ``head_of_apache.main._main``, and
+    ``mapping`` can also be a dictionary from file types to comment style names.
+    ``current_year`` defaults to the year in which the engine is created. An engine
+    can be kept for the whole life of a process, and used on the files of many
+    repositories: the comment style of every file type is resolved once, and the
+    headers are rendered once per comment style and year span (see ``header``).
+
+    ``check`` and ``fix`` return the same ``Result`` as the command line for a
+    single file, with its exit status, its messages and its ``OUTCOME_*`` outcome.
+    ``check_buffer`` and ``fix_buffer`` do the same for content held in memory, as
+    ``bytes`` or ``str``, and never touch the disk.
+    """
+
+    def __init__(
+        self,
+        author,
+        last_year_present=False,
+        start_year_override=None,
+        mapping=None,
+        minified="insert",
+        current_year=None,
+    ):
+        if isinstance(mapping, dict):
+            mapping = mapping.items()
+        self.author = author
+        self.style_names = _merge_mapping(mapping)
+        self.comment_styles = {
+            file_type: COMMENT_STYLES[style]
+            for file_type, style in self.style_names.items()
+        }
+        self._check_settings = Settings(
+            author=author,
+            current_year=str(current_year or _current_year()),
+            dry_run=True,
+            last_year_present=last_year_present,
+            start_year_override=(
+                str(start_year_override) if start_year_override is not None else None
+            ),
+            minified=minified,
+        )
+        self._fix_settings = self._check_settings._replace(dry_run=False)
+
+    @property
+    def current_year(self):
+        return self._check_settings.current_year
+
+    def comment_style(self, path):
+        """Return the comment style of ``path``, which depends on its suffix.
+
+        Raises a ``ValueError`` if no comment style is mapped to its file type.
+        """
+        file_type = os.path.splitext(path)[1][1:]
+        try:
+            return self.comment_styles[file_type]
+        except KeyError:
+            raise ValueError(
+                f"No comment style is mapped to the file type of '{path}'."
+            ) from None
+
+    def _file_type_style(self, file_type):
+        try:
+            return self.comment_styles[file_type.lstrip(".")]
+        except KeyError:
+            raise ValueError(
+                f"No comment style is mapped to the file type '{file_type}'."
+            ) from None
+
+    def header(self, style, start_year=None, end_year=None):
+        """Return the ``RenderedHeader`` of a comment style name and year span.
+
+        The years default to the ones of a new header. Headers are memoized, so the
+        same object is returned every time for the same arguments.
+        """
+        settings = self._check_settings
+        if start_year is None:
+            start_year = settings.start_year_override or settings.current_year
+        if end_year is None:
+            end_year = (
+                "present" if settings.last_year_present else settings.current_year
+            )
+        return render_license_header(
+            self.author, f"{start_year} - {end_year}", **COMMENT_STYLES[style]
+        )
+
+    def check(self, path):
+        """Check the license header of ``path`` without changing the file."""
+        settings = self._check_settings
+        check = _check_file(path, self.comment_style(path), settings)
+        return _finish_check(check, settings)
+
+    def fix(self, path):
+        """Check the license header of ``path``, and write it if needed."""
+        settings = self._fix_settings
+        check = _check_file(path, self.comment_style(path), settings)
+        return _finish_check(check, settings)
+
+    def check_buffer(self, content, file_type, name="<buffer>"):
+        """Check the license header of ``content``, of the given file type.
+
+        ``content`` is the ``bytes`` or ``str`` content of a file, and ``file_type``
+        its suffix, with or without the leading dot. ``name`` stands for the file
+        in the messages.
+        """
+        settings = self._check_settings
+        check = _check_buffer(
+            _encode(content), name, self._file_type_style(file_type), settings
+        )
+        return _finish_check(check, settings)
+
+    def fix_buffer(self, content, file_type, name="<buffer>"):
+        """Return ``content`` with its license header, and the ``Result`` of the fix.
+
+        The arguments are the same as for ``check_buffer``. The fixed content has
+        the type of ``content``, and it is ``content`` itself if nothing changed.
+        """
+        settings = self._fix_settings
+        data = _encode(content)
+        check = _check_buffer(data, name, self._file_type_style(file_type), settings)
+        if not _needs_fix(check, settings):
+            return content, _report(name, _outcome(check), settings)
+        text = isinstance(content, str)
+        fixed = _fix_buffer(data, check, settings, text=text)
+        if text:
+            fixed = fixed.decode(TEXT_ENCODING, TEXT_ERRORS)
+        return fixed, Result(1, [_fixed_message(check)], OUTCOME_FIXED)
+
+    def check_buffers(self, items):
+        """Return the ``check_buffer`` results of many ``(content, file_type)`` or
+        ``(content, file_type, name)`` items, in order.
+
+        This is a convenience loop over ``check_buffer``, not a faster batch path.
+        """
+        return [self.check_buffer(*item) for item in items]
+
+    def fix_buffers(self, items):
+        """Return the ``fix_buffer`` results of many items, like ``check_buffers``."""
+        return [self.fix_buffer(*item) for item in items]
+
+
+def _encode(content):
+    if isinstance(content, str):
+        return content.encode(TEXT_ENCODING, TEXT_ERRORS)
+    return content
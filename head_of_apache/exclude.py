@@ -0,0 +1,205 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import os
+import re
+
+# Directory names that are never traversed while searching for source files.
+DEFAULT_EXCLUDES = frozenset(
+    [
+        ".bzr",
+        ".git",
+        ".hg",
+        ".mypy_cache",
+        ".nox",
+        ".pytest_cache",
+        ".ruff_cache",
+        ".svn",
+        ".tox",
+        ".venv",
+        "__pycache__",
+        "bower_components",
+        "node_modules",
+        "venv",
+    ]
+)
+
+_MAGIC_CHARACTERS = re.compile(r"[*?[]")
+_TERMINAL = None
+
+
+def has_magic(pattern):
+    return _MAGIC_CHARACTERS.search(pattern) is not None
+
+
+def to_posix(path):
+    if os.sep != "/":
+        path = path.replace(os.sep, "/")
+    return path
+
+
+def normalize_path(path):
+    """Return the absolute, case normalized and ``/`` separated form of ``path``."""
+    return to_posix(os.path.normcase(os.path.abspath(path)))
+
+
+def translate_glob(pattern):
+    """Translate a ``/`` separated glob pattern into a regular expression string.
+
+    ``*`` and ``?`` never match a ``/``, while ``**`` matches across directories. A
+    ``**/`` segment also matches zero directories, so ``a/**/b`` matches ``a/b``. A
+    backslash escapes the following character.
+    """
+    i, n = 0, len(pattern)
+    result = []
+    while i < n:
+        character = pattern[i]
+        i += 1
+        if character == "*":
+            if i < n and pattern[i] == "*":
+                i += 1
+                if i < n and pattern[i] == "/":
+                    i += 1
+                    result.append("(?:.*/)?")
+                else:
+                    result.append(".*")
+            else:
+                result.append("[^/]*")
+        elif character == "?":
+            result.append("[^/]")
+        elif character == "\\" and i < n:
+            result.append(re.escape(pattern[i]))
+            i += 1
+        elif character == "[":
+            j = i
+            if j < n and pattern[j] == "!":
+                j += 1
+            if j < n and pattern[j] == "]":
+                j += 1
+            j = pattern.find("]", j)
+            if j == -1:
+                result.append(re.escape(character))
+            else:
+                content = pattern[i:j].replace("\\", "\\\\")
+                if content.startswith("!"):
+                    content = "^" + content[1:]
+                elif content.startswith("^"):
+                    content = "\\" + content
+                result.append(f"[{content}]")
+                i = j + 1
+        else:
+            result.append(re.escape(character))
+    return "".join(result)
+
+
+def compile_globs(patterns, flags=0):
+    """Compile several glob patterns into a single regular expression."""
+    if not patterns:
+        return None
+    return re.compile(
+        "|".join(f"(?:{translate_glob(pattern)})" for pattern in patterns), flags
+    )
+
+
+class ExcludeMatcher:
+    """Compiled set of exclusion rules.
+
+    Plain paths are stored in a prefix trie of their normalized path components.
+    Glob patterns are split in two groups: patterns without a ``/`` are matched
+    against the name of every file and directory at any depth, while the rest are
+    made relative to the current working directory and matched against the whole
+    path. Each group is compiled into one combined regular expression.
+    ``default_excludes`` holds directory names that are pruned while traversing a
+    directory tree.
+    """
+
+    def __init__(self, exclude=None, default_excludes=DEFAULT_EXCLUDES):
+        self._trie = {}
+        self._literals = set()
+        name_patterns = []
+        path_patterns = []
+        for pattern in exclude or []:
+            pattern = to_posix(os.fspath(pattern)).rstrip("/") or "/"
+            if not has_magic(pattern):
+                normalized = normalize_path(pattern)
+                self._literals.add(normalized)
+                node = self._trie
+                for part in normalized.split("/"):
+                    node = node.setdefault(part, {})
+                node[_TERMINAL] = True
+            elif "/" not in pattern:
+                name_patterns.append(os.path.normcase(pattern))
+            else:
+                path_patterns.append(normalize_path(pattern))
+        self._names = compile_globs(name_patterns)
+        self._paths = compile_globs(path_patterns)
+        self.default_excludes = frozenset(default_excludes or [])
+        # Whether the matcher needs the full path of a directory entry, or if its
+        # name is enough.
+        self.matches_paths = bool(self._literals) or self._paths is not None
+
+    def match(self, path, name, is_dir=False):
+        """Check a single directory entry, ignoring its parent directories.
+
+        ``path`` must already be normalized (see ``normalize_path``) if the matcher
+        ``matches_paths``.
+        """
+        if is_dir and name in self.default_excludes:
+            return True
+        if self._names is not None and self._names.fullmatch(os.path.normcase(name)):
+            return True
+        if self.matches_paths:
+            if path in self._literals:
+                return True
+            if self._paths is not None and self._paths.fullmatch(path):
+                return True
+        return False
+
+    def is_excluded(self, path, root=None, is_dir=False):
+        """Check whether ``path`` or any of its parent directories is excluded.
+
+        Name patterns are only applied to the components of ``path`` that lie below
+        ``root``, or below the current working directory if ``root`` is not given and
+        ``path`` is inside of it. The default excluded directory names are only
+        applied to the directories between ``root`` and ``path``, including ``path``
+        itself if ``is_dir``.
+        """
+        path = normalize_path(path)
+        parts = path.split("/")
+        node = self._trie
+        for part in parts:
+            node = node.get(part)
+            if node is None:
+                break
+            if _TERMINAL in node:
+                return True
+
+        if root is None:
+            base = normalize_path(os.curdir)
+            base_depth = len(base.split("/")) if path.startswith(base + "/") else 1
+            default_excludes = ()
+        else:
+            base_depth = len(normalize_path(root).split("/"))
+            default_excludes = self.default_excludes
+        for depth in range(1, len(parts) + 1):
+            if depth > base_depth:
+                name = parts[depth - 1]
+                if (is_dir or depth < len(parts)) and name in default_excludes:
+                    return True
+                if self._names is not None and self._names.fullmatch(name):
+                    return True
+            if self._paths is not None and self._paths.fullmatch(
+                "/".join(parts[:depth]) or "/"
+            ):
+                return True
+        return False
@@ -0,0 +1,270 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import os
+import time
+
+from .exclude import normalize_path
+
+GIT_EXECUTABLE = "git"
+GITLINK_MODE = "160000"
+SYMLINK_MODE = "120000"
+CHUNK_SIZE = 1 << 16
+
+
+class GitError(Exception):
+    """Raised when a git command cannot be run or exits with an error."""
+
+
+def _git_command(directory, *args):
+    return [GIT_EXECUTABLE, "-C", os.fspath(directory), *args]
+
+
+def run_git(directory, *args):
+    """Run a git command in ``directory`` and return its standard output as bytes."""
+    import subprocess
+
+    try:
+        completed = subprocess.run(
+            _git_command(directory, *args),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=False,
+        )
+    except OSError as e:
+        raise GitError(str(e)) from e
+    if completed.returncode != 0:
+        raise GitError(completed.stderr.decode(errors="replace").strip())
+    return completed.stdout
+
+
+def split_nul(output):
+    """Split the ``-z`` output of a git command into decoded file names."""
+    return [os.fsdecode(record) for record in output.split(b"\0") if record]
+
+
+def iter_git_records(directory, *args):
+    """Stream the NUL separated records printed by a git command.
+
+    The output is read in fixed size chunks, so listing a huge index never holds
+    more than one chunk and one record in memory.
+    """
+    import subprocess
+
+    try:
+        process = subprocess.Popen(
+            _git_command(directory, *args),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+    except OSError as e:
+        raise GitError(str(e)) from e
+    with process:
+        pending = b""
+        while True:
+            chunk = process.stdout.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            records = (pending + chunk).split(b"\0")
+            pending = records.pop()
+            for record in records:
+                yield record
+        if pending:
+            yield pending
+    if process.returncode != 0:
+        raise GitError(f"git {args[0]} exited with status {process.returncode}")
+
+
+def iter_index(directory):
+    """Yield the ``(mode, object_name, path)`` of the files tracked below ``directory``.
+
+    Paths are relative to ``directory``. Files that are tracked but were deleted from
+    the working tree are skipped, as are unmerged duplicates. A ``GitError`` is
+    raised before anything is yielded if ``directory`` is not inside a git working
+    tree.
+    """
+    deleted = set(split_nul(run_git(directory, "ls-files", "-z", "--deleted")))
+    previous = None
+    for record in iter_git_records(directory, "ls-files", "-z", "--stage"):
+        info, _, path = record.partition(b"\t")
+        path = os.fsdecode(path)
+        if path == previous or path in deleted:
+            continue
+        previous = path
+        mode, object_name, _ = info.decode().split(" ")
+        yield mode, object_name, path
+
+
+def iter_tree(directory, ref, pathspec=()):
+    """Yield the ``(mode, object_name, path)`` of the files in the tree of ``ref``.
+
+    Like for ``iter_index``, only the files below ``directory`` are listed, with
+    paths relative to it, and nothing is checked out.
+    """
+    for record in iter_git_records(
+        directory, "ls-tree", "-r", "-z", ref, "--", *pathspec
+    ):
+        info, _, path = record.partition(b"\t")
+        mode, _, object_name = info.decode().split(" ")
+        yield mode, object_name, os.fsdecode(path)
+
+
+def commit_year(directory, ref):
+    """Return the year in which the commit that ``ref`` points to was committed."""
+    output = run_git(directory, "log", "-1", "--format=%ct", ref, "--")
+    return time.gmtime(int(output)).tm_year
+
+
+class BlobReader:
+    """Read the start of git blobs through a single ``git cat-file --batch`` process.
+
+    The process is started once and fed one object name at a time, so reading many
+    blobs does not pay for a new git process per blob. git always sends the whole
+    blob, but only its first bytes are kept, and the rest is read in fixed size
+    chunks and dropped.
+    """
+
+    def __init__(self, directory):
+        import subprocess
+
+        try:
+            self._process = subprocess.Popen(
+                _git_command(directory, "cat-file", "--batch"),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError as e:
+            raise GitError(str(e)) from e
+
+    def read_prefix(self, object_name, size):
+        """Return at most the first ``size`` bytes of the blob ``object_name``."""
+        stdin, stdout = self._process.stdin, self._process.stdout
+        try:
+            stdin.write(object_name.encode() + b"\n")
+            stdin.flush()
+        except OSError as e:
+            raise GitError(f"git cat-file exited: {e}") from e
+        fields = stdout.readline().split()
+        if len(fields) != 3:
+            raise GitError(f"git cat-file cannot read the object {object_name}")
+        length = int(fields[2])
+        prefix = stdout.read(min(size, length))
+        # The rest of the content, and the newline that ends it.
+        remaining = length - len(prefix) + 1
+        while remaining:
+            chunk = stdout.read(min(remaining, CHUNK_SIZE))
+            if not chunk:
+                raise GitError("git cat-file exited unexpectedly")
+            remaining -= len(chunk)
+        return prefix
+
+    def close(self):
+        self._process.stdin.close()
+        self._process.stdout.close()
+        self._process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_changes(directory, ref=None, staged=False, pathspec=()):
+    """Yield the files below ``directory`` that were added, copied, modified or renamed.
+
+    Without ``ref``, unstaged changes are listed, or staged ones with ``staged``.
+    With ``ref``, the changes since ``ref`` are listed, either up to the working tree
+    or, with ``staged``, up to the index. Paths are relative to ``directory``.
+    """
+    args = ["diff", "--name-only", "-z", "--diff-filter=ACMR", "--relative"]
+    if staged:
+        args.append("--cached")
+    if ref is not None:
+        args.append(ref)
+    args.append("--")
+    args.extend(pathspec)
+    return iter(split_nul(run_git(directory, *args)))
+
+
+def toplevel(directory):
+    """Return the root of the git working tree that contains ``directory``.
+
+    Unlike ``git rev-parse --show-toplevel``, symbolic links in ``directory`` are not
+    resolved, so the result can be compared with the paths found under it.
+    """
+    cdup = os.fsdecode(run_git(directory, "rev-parse", "--show-cdup").rstrip(b"\n"))
+    return os.path.normpath(os.path.join(os.path.abspath(directory), cdup))
+
+
+def iter_changed(root):
+    """Yield the paths of the tracked files that differ from the index in ``root``.
+
+    Unlike ``git diff-files``, this compares the content of the files whose stat
+    information is stale, which is the case for every file of a copied or restored
+    clone. The index itself is left untouched.
+    """
+    records = iter(
+        split_nul(
+            run_git(
+                root,
+                "--no-optional-locks",
+                "status",
+                "--porcelain",
+                "-z",
+                "--untracked-files=no",
+                "--ignore-submodules",
+            )
+        )
+    )
+    for record in records:
+        status, path = record[:2], record[3:]
+        if status[0] in "RC":
+            # The original path of a rename or copy follows.
+            next(records, None)
+        if status[1] != " ":
+            yield path
+
+
+class BlobIndex:
+    """Git object names of the tracked files that are unchanged in the working tree.
+
+    The object name of a clean tracked file is the SHA-1 of its content as a git
+    blob, so it can be used as a content hash without reading the file. Files that
+    differ from the index, as well as symbolic links and submodules, are left out.
+    """
+
+    def __init__(self):
+        self._toplevels = set()
+        self._object_names = {}
+
+    def add(self, directory):
+        """Load the index of the git working tree of ``directory``, if there is one."""
+        try:
+            root = toplevel(directory)
+            if root in self._toplevels:
+                return
+            self._toplevels.add(root)
+            changed = set(iter_changed(root))
+            for mode, object_name, path in iter_index(root):
+                if mode not in (GITLINK_MODE, SYMLINK_MODE) and path not in changed:
+                    self._object_names[normalize_path(os.path.join(root, path))] = (
+                        object_name
+                    )
+        except GitError:
+            pass
+
+    def get(self, path):
+        """Return the object name of ``path``, or ``None`` if it is not known."""
+        return self._object_names.get(normalize_path(path))
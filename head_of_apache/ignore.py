@@ -0,0 +1,142 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import re
+from functools import lru_cache
+
+from .exclude import translate_glob
+
+# Ignore files whose patterns are always relative to the directory that holds them,
+# even if they do not contain a "/".
+ANCHORED_IGNORE_FILES = frozenset([".dockerignore"])
+
+
+def parse_ignore_line(line, anchored=False):
+    """Parse one line of a gitignore style file.
+
+    Returns a ``(regex, negate, directory_only)`` tuple, or ``None`` for blank lines
+    and comments. The regular expression must be matched against the ``/``
+    separated path of an entry, relative to the directory of the ignore file.
+    """
+    line = line.rstrip("\r\n")
+    if not line or line.startswith("#"):
+        return None
+    stripped = line.rstrip(" ")
+    if stripped.endswith("\\") and len(stripped) < len(line):
+        stripped += " "
+    line = stripped
+    negate = line.startswith("!")
+    if negate or line.startswith(("\\!", "\\#")):
+        line = line[1:]
+    directory_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+    if "/" in line or anchored:
+        line = line.lstrip("/")
+    else:
+        line = "**/" + line
+    return re.compile(translate_glob(line)), negate, directory_only
+
+
+@lru_cache(maxsize=256)
+def parse_ignore_file(content, anchored=False):
+    """Compile the content of an ignore file into a tuple of rules.
+
+    The result is cached by content, so identical ignore files spread across a tree
+    are only compiled once.
+    """
+    rules = []
+    for line in content.splitlines():
+        rule = parse_ignore_line(line, anchored=anchored)
+        if rule is not None:
+            rules.append(rule)
+    return tuple(rules)
+
+
+class _Layer:
+    """The rules of one ignore file, along with its position in the tree."""
+
+    def __init__(self, prefix_length, rules):
+        self.prefix_length = prefix_length
+        self.rules = rules
+        if not any(negate for _, negate, _ in rules):
+            # Without negations, any match means that the entry is ignored, so the
+            # patterns can be merged into one regular expression per entry type.
+            self.any_match = {
+                True: _combine(rule for rule, _, _ in rules),
+                False: _combine(rule for rule, _, dir_only in rules if not dir_only),
+            }
+        else:
+            self.any_match = None
+
+    def match(self, path, is_dir):
+        """``True`` if ``path`` is ignored, ``False`` if re-included, else ``None``."""
+        path = path[self.prefix_length :]
+        if self.any_match is not None:
+            regex = self.any_match[is_dir]
+            return True if regex is not None and regex.fullmatch(path) else None
+        for regex, negate, directory_only in reversed(self.rules):
+            if directory_only and not is_dir:
+                continue
+            if regex.fullmatch(path):
+                return not negate
+        return None
+
+
+def _combine(regexes):
+    patterns = [f"(?:{regex.pattern})" for regex in regexes]
+    return re.compile("|".join(patterns)) if patterns else None
+
+
+class IgnoreRules:
+    """The ignore rules in effect for a directory.
+
+    A rule set is an immutable stack of the compiled ignore files found between the
+    root of the traversal and a directory. Descending into a directory that does not
+    have an ignore file reuses the rule set of its parent, and descending into one
+    that has one only compiles the new file, so the rules of parent directories are
+    never parsed again. Paths are matched relative to the root of the traversal, and
+    the rules of deeper ignore files take precedence, as they do in git.
+    """
+
+    def __init__(self, layers=()):
+        self._layers = tuple(layers)
+
+    def __bool__(self):
+        return bool(self._layers)
+
+    def extend(self, ignore_file, directory, anchored=False):
+        """Return the rules for ``directory`` after reading its ``ignore_file``.
+
+        ``directory`` is the ``/`` separated path relative to the root of the
+        traversal, or an empty string for the root itself.
+        """
+        try:
+            with open(ignore_file, encoding="utf-8", errors="replace") as f:
+                content = f.read()
+        except OSError:
+            return self
+        rules = parse_ignore_file(content, anchored=anchored)
+        if not rules:
+            return self
+        prefix_length = len(directory) + 1 if directory else 0
+        return IgnoreRules(self._layers + (_Layer(prefix_length, rules),))
+
+    def is_ignored(self, path, is_dir=False):
+        """Whether the ``/`` separated ``path``, relative to the root, is ignored."""
+        for layer in reversed(self._layers):
+            ignored = layer.match(path, is_dir)
+            if ignored is not None:
+                return ignored
+        return False
@@ -25,17 +25,28 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-import argparse
-import glob
+import codecs
+import io
 import itertools
 import os
+import posixpath
 import re
-import shutil
+import stat
 import sys
-import tempfile
-from datetime import datetime, timezone
+import time
+from collections import deque, namedtuple
+from functools import cached_property, lru_cache
 from pathlib import Path
 
+from . import __version__, git, trace
+from .exclude import DEFAULT_EXCLUDES, ExcludeMatcher, normalize_path
+from .ignore import ANCHORED_IGNORE_FILES, IgnoreRules
+
+# Modules that are only needed to rewrite files, to run several jobs, to parse the
+# command line or to collect statistics are imported where they are used, so that
+# the start of short runs (e.g. pre-commit hooks over a few files) does not pay
+# for them. tests/test_import_time.py checks that they stay out of the imports.
+
 DESIRED_LICENSE_NOTICE = (
     r"Copyright (?P<years>\d{4}\s*-\s*\d{4}|\d{4}\s*-\s*present) (?P<author>[A-Za-z].*)"
 )
@@ -56,6 +67,54 @@ LICENSE = """{comment_start}Copyright {year} {author}
 {comment_middle}See the License for the specific language governing permissions and
 {comment_middle}limitations under the License.{comment_end}"""
 LICENSE_LENGTH = len(LICENSE.splitlines())
+# Maximum number of characters read from the start of a file to find its header.
+HEADER_READ_BUDGET = 1 << 16
+# Maximum number of characters read from a single line of a file. Longer lines are
+# typical of minified or generated files.
+MAX_LINE_LENGTH = 1 << 12
+# Markers that flag generated files when found in their first lines.
+GENERATED_FILE_MARKERS = ("@generated", "DO NOT EDIT")
+_GENERATED_FILE_MARKER_BYTES = tuple(
+    marker.encode() for marker in GENERATED_FILE_MARKERS
+)
+# Lines that must stay at the very top of a file, before the license header.
+SPECIAL_OPENNINGS = {
+    "shebanged": "#!",
+    "encoded": "# -*- coding:",
+}
+_SPECIAL_OPENNING_BYTES = {
+    key: openning.encode() for key, openning in SPECIAL_OPENNINGS.items()
+}
+# Number of bytes at the start of a file that are looked at to tell if it is binary.
+BINARY_SNIFF_SIZE = 8000
+# The UTF-32 byte order marks either start with one of these or contain a NUL byte.
+_BINARY_BOMS = (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)
+# What to do with minified or generated files.
+MINIFIED_POLICIES = ("insert", "warn", "skip")
+# Outcomes of a header check.
+OUTCOME_OK = 0
+OUTCOME_MISSING = 1
+OUTCOME_OUTDATED = 2
+OUTCOME_SKIPPED = 3
+OUTCOME_FIXED = 4
+OUTCOME_ERROR = 5
+OUTCOME_BINARY = 6
+# Name of the ``head_of_apache.stats.Stats`` counter of each outcome. Fixed files
+# are counted as "inserted" or "updated" by their ``FileTimer``.
+_OUTCOME_COUNTERS = {
+    OUTCOME_OK: "ok",
+    OUTCOME_MISSING: "missing",
+    OUTCOME_OUTDATED: "outdated",
+    OUTCOME_SKIPPED: "skipped",
+    OUTCOME_ERROR: "errors",
+    OUTCOME_BINARY: "binary",
+}
+# Maximum number of bytes held in memory while copying the body of a file.
+COPY_CHUNK_SIZE = 1 << 20
+# Minimum number of files for which a process pool is used instead of a thread pool.
+PROCESS_POOL_MIN_FILES = 2000
+# Number of files sent at once to a worker process.
+PROCESS_POOL_CHUNK_SIZE = 64
 
 
 COMMENT_STYLES = {
@@ -97,40 +156,342 @@ FILE_TYPE_MAPPING = {
 }
 
 
-def get_files(paths, exclude=None, file_type_mapping=None):
+def _real_path(path):
+    return normalize_path(os.path.realpath(path))
+
+
+def _is_within(path, directories):
+    """Whether the normalized ``path`` is in one of the normalized ``directories``."""
+    while True:
+        if path in directories:
+            return True
+        parent = posixpath.dirname(path)
+        if parent == path:
+            return False
+        path = parent
+
+
+def _scan_tree(root, file_type_mapping, matcher, visited_roots, ignore_files=()):
+    """Yield the files below ``root`` whose suffix is in ``file_type_mapping``.
+
+    The tree is traversed a single time with ``os.scandir``, reusing the type
+    information of each ``DirEntry`` instead of issuing extra ``stat`` calls. Like
+    ``glob``, hidden files and directories are not visited, and neither are the
+    entries rejected by the ``ExcludeMatcher`` or by the gitignore style
+    ``ignore_files`` found along the way, so excluded directories are never
+    entered.
+
+    Memory use only depends on the depth and width of the tree, never on its number
+    of files. Symlinks are the only way to reach a file twice, so only they are
+    deduplicated: ``visited_roots`` holds the real paths of the searched directories
+    and of the symlinked targets that were followed outside of them. A symlink is
+    skipped if its target is inside one of them (it is, or was, visited through its
+    real path), which also breaks symlink loops.
+    """
+    matches_paths = matcher.matches_paths
+    tracing = trace.enabled()
+    stack = [(root, normalize_path(root) if matches_paths else None, "", IgnoreRules())]
+    while stack:
+        directory, normalized_directory, relative_directory, rules = stack.pop()
+        if tracing:
+            start = time.perf_counter()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+        if tracing:
+            trace.publish_span(
+                "scandir",
+                "discovery",
+                start,
+                directory=os.fspath(directory),
+                entries=len(entries),
+            )
+        if ignore_files:
+            names = {entry.name for entry in entries}
+            for ignore_file in ignore_files:
+                if ignore_file in names:
+                    rules = rules.extend(
+                        os.path.join(directory, ignore_file),
+                        relative_directory,
+                        anchored=ignore_file in ANCHORED_IGNORE_FILES,
+                    )
+        subdirectories = []
+        for entry in entries:
+            name = entry.name
+            if name.startswith("."):
+                continue
+            normalized_path = (
+                f"{normalized_directory.rstrip('/')}/{os.path.normcase(name)}"
+                if matches_paths
+                else None
+            )
+            relative_path = (
+                f"{relative_directory}/{name}" if relative_directory else name
+            )
+            try:
+                if entry.is_dir():
+                    if matcher.match(normalized_path, name, is_dir=True) or (
+                        rules and rules.is_ignored(relative_path, is_dir=True)
+                    ):
+                        continue
+                    if entry.is_symlink() and not _follow_symlink(
+                        entry.path, visited_roots
+                    ):
+                        continue
+                    subdirectories.append(
+                        (entry.path, normalized_path, relative_path, rules)
+                    )
+                    continue
+                if os.path.splitext(name)[1][1:] not in file_type_mapping:
+                    continue
+                if (
+                    not entry.is_file()
+                    or matcher.match(normalized_path, name)
+                    or (rules and rules.is_ignored(relative_path))
+                ):
+                    continue
+                if entry.is_symlink() and not _follow_symlink(
+                    entry.path, visited_roots, file_type_mapping
+                ):
+                    continue
+            except OSError:
+                continue
+            yield Path(entry.path)
+        # Reverse so that the subdirectories are popped in alphabetical order.
+        stack.extend(reversed(subdirectories))
+
+
+def _follow_symlink(path, visited_roots, file_type_mapping=None):
+    """Decide whether to follow the symlink at ``path`` while walking.
+
+    Symlinks whose target is inside of ``visited_roots`` are not followed. When
+    ``file_type_mapping`` is given, ``path`` links to a file, and it is still
+    followed if the target itself would not be checked because of its suffix.
+    Followed targets are added to ``visited_roots``.
+    """
+    target = _real_path(path)
+    if _is_within(target, visited_roots):
+        if file_type_mapping is None:
+            return False
+        if posixpath.splitext(target)[1][1:] in file_type_mapping:
+            return False
+    visited_roots.add(target)
+    return True
+
+
+def _filter_tracked(root, relative_paths, file_type_mapping, matcher):
+    """Yield the ``/`` separated ``relative_paths`` below ``root`` that must be checked.
+
+    The same hidden file and exclusion rules as in ``_scan_tree`` are applied,
+    caching the decision for the current directory, since the paths listed by git
+    are sorted.
+    """
+    previous_directory = None
+    directory_excluded = False
+    for relative_path in relative_paths:
+        directory, _, name = relative_path.rpartition("/")
+        if os.path.splitext(name)[1][1:] not in file_type_mapping:
+            continue
+        if directory != previous_directory:
+            previous_directory = directory
+            directory_excluded = any(
+                part.startswith(".") for part in directory.split("/")
+            ) or matcher.is_excluded(os.path.join(root, directory), root, is_dir=True)
+        if directory_excluded or name.startswith("."):
+            continue
+        path = os.path.join(root, relative_path)
+        if matcher.match(normalize_path(path) if matcher.matches_paths else None, name):
+            continue
+        yield path
+
+
+def _scan_index(root, file_type_mapping, matcher):
+    """Yield the files tracked by git below ``root`` whose suffix is in the mapping.
+
+    The candidates are read from the git index instead of walking the file system,
+    so untracked and ignored files are never visited. Raises a ``GitError`` if
+    ``root`` is not inside a git working tree.
+    """
+    relative_paths = (
+        relative_path
+        for mode, _, relative_path in git.iter_index(root)
+        if mode not in (git.GITLINK_MODE, git.SYMLINK_MODE)
+    )
+    for path in _filter_tracked(root, relative_paths, file_type_mapping, matcher):
+        yield Path(path)
+
+
+def _scan_changes(root, file_type_mapping, matcher, changed_since, staged):
+    """Yield the files below ``root`` changed since ``changed_since`` or ``staged``.
+
+    Only the paths listed by ``git diff`` are considered, so the tree is never
+    walked. Raises a ``GitError`` if ``root`` is not inside a git working tree or
+    if ``changed_since`` is not a valid revision.
+    """
+    relative_paths = git.iter_changes(root, changed_since, staged)
+    for path in _filter_tracked(root, relative_paths, file_type_mapping, matcher):
+        # Staged files may have been deleted from the working tree since.
+        if os.path.isfile(path):
+            yield Path(path)
+
+
+def _changed_files(directory, changed_since, staged):
+    """Return the normalized paths of the files directly in ``directory`` that
+    changed since ``changed_since`` or are ``staged``, listed by a single ``git diff``.
+    """
+    return {
+        normalize_path(os.path.join(directory, relative_path))
+        for relative_path in git.iter_changes(
+            directory, changed_since, staged, [":(glob)*"]
+        )
+    }
+
+
+def _outermost_paths(paths, keep_files=False):
+    """Drop the paths that are nested inside of another directory in ``paths``.
+
+    If ``keep_files`` is set, only the nested directories are dropped.
+    """
+    normalized = [(path, normalize_path(path)) for path in paths]
+    directories = {
+        normalized_path for path, normalized_path in normalized if os.path.isdir(path)
+    }
+    if not directories:
+        return list(paths)
+    outermost = []
+    for path, normalized_path in normalized:
+        parent = posixpath.dirname(normalized_path)
+        while parent not in directories and posixpath.dirname(parent) != parent:
+            parent = posixpath.dirname(parent)
+        if parent not in directories or (
+            keep_files and normalized_path not in directories
+        ):
+            outermost.append(path)
+    return outermost
+
+
+def _skip_seen(files, explicit_files, seen_files):
+    """Yield the ``files`` found in a directory that were not yielded yet.
+
+    Only the files that were also given explicitly, whose ``(st_dev, st_ino)`` are in
+    ``explicit_files``, can have been, and they are recorded in ``seen_files``.
+    """
+    if not explicit_files:
+        yield from files
+        return
+    for file in files:
+        try:
+            file_stat = os.stat(file)
+        except OSError:
+            yield file
+            continue
+        key = (file_stat.st_dev, file_stat.st_ino)
+        if key in explicit_files:
+            if key in seen_files:
+                continue
+            seen_files.add(key)
+        yield file
+
+
+def get_files(
+    paths,
+    exclude=None,
+    file_type_mapping=None,
+    default_excludes=DEFAULT_EXCLUDES,
+    discovery="walk",
+    ignore_files=None,
+    changed_since=None,
+    staged=False,
+):
+    """Lazily yield the files to check for a license header.
+
+    Files are searched for in ``paths``, which can be files or directories. The
+    files are produced while they are being found, and the memory used by the
+    search does not grow with the number of files. If ``changed_since`` is a git
+    revision or ``staged`` is set, only the files that ``git diff`` lists as changed
+    since that revision, respectively staged in the index, are yielded, and a
+    ``GitError`` is raised if a path is not inside a git working tree.
+    """
+    incremental = changed_since is not None or staged
     # Extend the existing file type mapping, if applicable.
     file_type_mapping = file_type_mapping or FILE_TYPE_MAPPING
 
-    # Process exclude directories
-    exclude = [Path(path) for path in exclude] if exclude is not None else []
+    # Compile the excluded paths and patterns once.
+    matcher = ExcludeMatcher(exclude, default_excludes=default_excludes)
 
-    # Collect all files to check for a license header.
-    file_lists = []
+    # Explicitly given files are kept even if they are inside of a given directory,
+    # as the search of that directory may skip them.
+    paths = _outermost_paths(paths, keep_files=True)
+    visited_roots = {_real_path(path) for path in paths if os.path.isdir(path)}
+    seen_files = set()
+    explicit_files = set()
+    if visited_roots:
+        for path in paths:
+            try:
+                path_stat = os.stat(path)
+            except OSError:
+                continue
+            if stat.S_ISREG(path_stat.st_mode):
+                explicit_files.add((path_stat.st_dev, path_stat.st_ino))
+    # The changed files of the directories of the explicitly given files.
+    changed_files = {}
 
+    # Collect all files to check for a license header in a single pass per path.
     for path in paths:
-        if os.path.isfile(path):
-            file_lists.append([path])
-        else:
-            for file_type in file_type_mapping:
-                file_lists.append(
-                    glob.iglob(
-                        os.path.join(path, "**", f"*.{file_type}"), recursive=True
-                    )
+        try:
+            path_stat = os.stat(path)
+        except OSError:
+            continue
+        if matcher.is_excluded(path):
+            continue
+        if stat.S_ISDIR(path_stat.st_mode):
+            if incremental:
+                files = _scan_changes(
+                    path, file_type_mapping, matcher, changed_since, staged
                 )
+                yield from _skip_seen(files, explicit_files, seen_files)
+                continue
+            if discovery == "git":
+                try:
+                    files = _scan_index(path, file_type_mapping, matcher)
+                    yield from _skip_seen(files, explicit_files, seen_files)
+                    continue
+                except git.GitError:
+                    # Not inside of a git working tree, walk the directory.
+                    pass
+            files = _scan_tree(
+                path,
+                file_type_mapping,
+                matcher,
+                visited_roots,
+                ignore_files=tuple(ignore_files or ()),
+            )
+            yield from _skip_seen(files, explicit_files, seen_files)
+        elif (
+            stat.S_ISREG(path_stat.st_mode)
+            and Path(path).suffix[1:] in file_type_mapping
+        ):
+            # Explicitly given files can still be repeated, or be hard links.
+            key = (path_stat.st_dev, path_stat.st_ino)
+            if key in seen_files:
+                continue
+            seen_files.add(key)
+            if incremental:
+                directory = normalize_path(os.path.dirname(path) or os.curdir)
+                if directory not in changed_files:
+                    changed_files[directory] = _changed_files(
+                        directory, changed_since, staged
+                    )
+                if normalize_path(path) not in changed_files[directory]:
+                    continue
+            yield Path(path)
 
-    def to_keep(path):
-        is_in_excluded = any([ex == path or ex in path.parents for ex in exclude])
-        return path.suffix[1:] in file_type_mapping and not is_in_excluded
 
-    files = filter(
-        to_keep,
-        (
-            Path(file)
-            for file in itertools.chain(*file_lists)
-            if not os.path.isdir(file)
-        ),
-    )
-    return list(files)
+def _current_year():
+    """Return the current year in UTC, as a string."""
+    return f"{time.gmtime().tm_year}"
 
 
 def get_license_header(author, year, comment_start, comment_middle, comment_end):
@@ -146,13 +507,88 @@ def get_license_header(author, year, comment_start, comment_middle, comment_end)
     return license_header
 
 
-def read_file_header_lines(f, comment_style, n_lines):
+# ``data`` is the header as it is written to new files: with a trailing newline,
+# with ``os.linesep`` line endings and encoded as UTF-8.
+RenderedHeader = namedtuple("RenderedHeader", ["text", "data", "n_lines"])
+
+
+@lru_cache(maxsize=1024)
+def _encode_header(text, newline):
+    return (text + "\n").replace("\n", newline).encode("utf-8")
+
+
+@lru_cache(maxsize=1024)
+def render_license_header(author, year, comment_start, comment_middle, comment_end):
+    """Return the memoized ``RenderedHeader`` of ``get_license_header``.
+
+    A run only writes a handful of distinct headers, one per comment style and
+    year span, so each of them is only formatted and encoded once per process.
+    """
+    text = get_license_header(author, year, comment_start, comment_middle, comment_end)
+    return RenderedHeader(text, _encode_header(text, os.linesep), text.count("\n") + 1)
+
+
+def _iter_lines(f, budget, max_line_length, newline="\n"):
+    """Yield the lines of ``f`` until ``budget`` characters have been read.
+
+    Lines are cut at ``max_line_length`` characters, and nothing else is read after a
+    line that had to be cut. ``newline`` must be ``b"\\n"`` for binary files.
+    """
+    while budget > 0:
+        limit = min(budget, max_line_length)
+        line = f.readline(limit)
+        if not line:
+            return
+        budget -= len(line)
+        yield line
+        if len(line) == limit and not line.endswith(newline):
+            return
+
+
+def read_file_header_lines(
+    f,
+    comment_style,
+    n_lines,
+    budget=HEADER_READ_BUDGET,
+    max_line_length=MAX_LINE_LENGTH,
+):
+    # Only the first lines of the file matter, never read more than the first
+    # ``budget`` characters of it, nor more than ``max_line_length`` characters of a
+    # single line.
+    lines = _iter_lines(f, budget, max_line_length)
+    first_line, special_openning_lines = _read_special_opennings(
+        lines, SPECIAL_OPENNINGS, ""
+    )
+    file_header = [first_line] + [
+        line if line.rstrip() else comment_style["comment_middle"] + "\n"
+        for line in itertools.islice(lines, n_lines - 1)
+    ]
+    return file_header, first_line, special_openning_lines
+
+
+def read_file_header_bytes(
+    f,
+    n_lines,
+    budget=HEADER_READ_BUDGET,
+    max_line_length=MAX_LINE_LENGTH,
+):
+    """Read the first lines of the binary file ``f`` without decoding them.
+
+    Returns the same ``(file_header, first_line, special_openning_lines)`` as
+    ``read_file_header_lines``, but with ``bytes`` lines, and with blank lines left
+    as they are.
+    """
+    lines = _iter_lines(f, budget, max_line_length, newline=b"\n")
+    first_line, special_openning_lines = _read_special_opennings(
+        lines, _SPECIAL_OPENNING_BYTES, b""
+    )
+    file_header = [first_line, *itertools.islice(lines, n_lines - 1)]
+    return file_header, first_line, special_openning_lines
+
+
+def _read_special_opennings(lines, special_opennings, empty_line):
     # Check if the first lines are shebangs or encodings
-    first_line = f.readline()
-    special_opennings = {
-        "shebanged": "#!",
-        "encoded": "# -*- coding:",
-    }
+    first_line = next(lines, empty_line)
     special_openning_lines = {}
     matched_special_openning = True
     while matched_special_openning:
@@ -163,14 +599,39 @@ def read_file_header_lines(f, comment_style, n_lines):
             if first_line.startswith(openning):
                 matched_special_openning = True
                 special_openning_lines[key] = first_line
-                first_line = f.readline()
+                first_line = next(lines, empty_line)
+    return first_line, special_openning_lines
 
-    file_header = [first_line] + [
-        line if line.rstrip() else comment_style["comment_middle"] + "\n"
-        for i, line in enumerate(f)
-        if i + 1 < n_lines
-    ]
-    return file_header, first_line, special_openning_lines
+
+def looks_binary(prefix):
+    """Guess whether a file is binary from the first bytes of its content.
+
+    A file is flagged if a NUL byte appears in its first ``BINARY_SNIFF_SIZE`` bytes,
+    as git does, or if it starts with a UTF-16 or UTF-32 byte order mark.
+    """
+    return b"\0" in prefix[:BINARY_SNIFF_SIZE] or prefix.startswith(_BINARY_BOMS)
+
+
+def looks_minified(path, file_header, max_line_length=MAX_LINE_LENGTH):
+    """Guess whether a file is minified or generated from its name and first lines.
+
+    ``file_header`` are the lines returned by ``read_file_header_lines`` or
+    ``read_file_header_bytes``. A file is
+    flagged if its name contains a ``.min.`` part, if one of its first lines is at
+    least ``max_line_length`` characters long or if they contain one of the
+    ``GENERATED_FILE_MARKERS``.
+    """
+    if ".min." in Path(path).name:
+        return True
+    newline, markers = "\n", GENERATED_FILE_MARKERS
+    if file_header and isinstance(file_header[0], bytes):
+        newline, markers = b"\n", _GENERATED_FILE_MARKER_BYTES
+    for line in file_header:
+        if len(line) >= max_line_length and not line.endswith(newline):
+            return True
+        if any(marker in line for marker in markers):
+            return True
+    return False
 
 
 def parse_license_years(years):
@@ -193,35 +654,105 @@ def parse_license_years(years):
     return start_year, end_year, wrong_space_format
 
 
-def validate_file_header(
-    first_line,
-    current_year,
-    author,
-    last_year_present,
-    start_year_override=None,
+LicenseNotice = namedtuple(
+    "LicenseNotice", ["author", "start_year", "end_year", "wrong_space_format"]
+)
+
+# Faster than calling the class.
+_make_notice = LicenseNotice._make
+
+# Both notice forms, factored so that the regular expression engine can skip to the
+# occurrences of "Copyright". At a given position, the form with an end year is
+# tried first, and it can only match if a "-" follows the start year. The author
+# stops at the line ending, which is kept in lines read as bytes, be it "\n" or
+# "\r\n".
+_LICENSE_NOTICES = (
+    r"Copyright (\d{4})(\s*)(?:-\s*(\d{4}|present) ([A-Za-z][^\r\n]*)"
+    r"|(?:-\s*)?? ([A-Za-z][^\r\n]*))"
+)
+
+
+class HeaderMatcher:
+    """Compiled matcher of the license notices of ``DESIRED_LICENSE_NOTICE`` and
+    ``SINGLE_DATE_LICENSE_NOTICE``.
+
+    Both forms are searched for in a single pass. As with two separate searches, a
+    notice of the first form anywhere in a line takes precedence over one of the
+    second form, and the years are parsed as ``parse_license_years`` would.
+    """
+
+    # The regular expressions are compiled when they are first used.
+    _desired_notice = r"Copyright (\d{4})(\s*)-\s*(\d{4}|present) ([A-Za-z][^\r\n]*)"
+
+    @cached_property
+    def _regexes(self):
+        return re.compile(_LICENSE_NOTICES), re.compile(self._desired_notice)
+
+    @cached_property
+    def _bytes_regexes(self):
+        return (
+            re.compile(_LICENSE_NOTICES.encode()),
+            re.compile(self._desired_notice.encode()),
+        )
+
+    @staticmethod
+    def _search(line, regex, desired_regex):
+        match = regex.search(line)
+        if match is None:
+            return None
+        start_year, space, end_year, author, single_date_author = match.groups()
+        if end_year is None:
+            # A later notice of the first form takes precedence.
+            desired_match = desired_regex.search(line, match.start() + 1)
+            if desired_match is None:
+                return single_date_author, start_year, None, space
+            start_year, space, end_year, author = desired_match.groups()
+        return author, start_year, end_year, space
+
+    def match(self, line):
+        """Return the ``LicenseNotice`` found in ``line``, or ``None``."""
+        groups = self._search(line, *self._regexes)
+        if groups is None:
+            return None
+        author, start_year, end_year, space = groups
+        return _make_notice((author, start_year, end_year or "", space != " "))
+
+    def match_bytes(self, line):
+        """Return the ``LicenseNotice`` found in the undecoded ``line``, or ``None``.
+
+        Only the years are decoded, the author is returned as ``bytes``. ``\\s`` and
+        ``\\d`` only match ASCII characters.
+        """
+        groups = self._search(line, *self._bytes_regexes)
+        if groups is None:
+            return None
+        author, start_year, end_year, space = groups
+        return _make_notice(
+            (
+                author,
+                start_year.decode(),
+                end_year.decode() if end_year is not None else "",
+                space != b" ",
+            )
+        )
+
+
+HEADER_MATCHER = HeaderMatcher()
+
+
+def _validate_notice(
+    license_notice, current_year, author, last_year_present, start_year_override
 ):
-    # Check whether license header is missing
-    current_year = str(current_year)
-    license_notice = re.search(DESIRED_LICENSE_NOTICE, first_line)
-    if not license_notice:
-        license_notice = re.search(SINGLE_DATE_LICENSE_NOTICE, first_line)
-    if not license_notice:
-        has_license_notice = False
-        must_update_license_notice = True
-        start_year = start_year_override or current_year
-        end_year = current_year if not last_year_present else "present"
-    elif license_notice.group("author") != author:
-        # There is an existing license under a different author. We must leave it there
-        # and prepend our own
+    if license_notice is None or license_notice.author != author:
+        # Either there is no license notice, or there is an existing license under a
+        # different author. We must leave it there and prepend our own
         has_license_notice = False
         must_update_license_notice = True
         start_year = start_year_override or current_year
         end_year = current_year if not last_year_present else "present"
     else:
         has_license_notice = True
-        start_year, end_year, wrong_space_format = parse_license_years(
-            license_notice.group("years")
-        )
+        start_year, end_year, wrong_space_format = license_notice[1:]
         if (
             (end_year != current_year and not last_year_present)
             or (end_year != "present" and last_year_present)
@@ -236,6 +767,519 @@ def validate_file_header(
     return has_license_notice, must_update_license_notice, start_year, end_year
 
 
+def validate_file_header(
+    first_line,
+    current_year,
+    author,
+    last_year_present,
+    start_year_override=None,
+):
+    return _validate_notice(
+        HEADER_MATCHER.match(first_line),
+        str(current_year),
+        author,
+        last_year_present,
+        start_year_override,
+    )
+
+
+def validate_headers(
+    first_lines,
+    current_year,
+    author,
+    last_year_present,
+    start_year_override=None,
+):
+    """Validate the first lines of many files at once.
+
+    Returns the same ``(has_license_notice, must_update_license_notice, start_year,
+    end_year)`` tuples as ``validate_file_header``, in the order of ``first_lines``.
+    """
+    current_year = str(current_year)
+    match = HEADER_MATCHER.match
+    return [
+        _validate_notice(
+            match(line), current_year, author, last_year_present, start_year_override
+        )
+        for line in first_lines
+    ]
+
+
+# ``skipped`` is either ``False`` or the reason why the file is left untouched:
+# "binary" or "minified". ``newline`` is the line ending of the first line of the
+# file, "\n" or "\r\n", or ``None`` if it has no complete line.
+HeaderCheck = namedtuple(
+    "HeaderCheck",
+    [
+        "file",
+        "comment_style",
+        "skipped",
+        "has_license_notice",
+        "must_update_license_notice",
+        "start_year",
+        "end_year",
+        "special_openning_lines",
+        "newline",
+    ],
+    defaults=(None,),
+)
+
+# ``timer`` is the ``head_of_apache.stats.FileTimer`` of the file, if statistics
+# are collected.
+Result = namedtuple(
+    "Result", ["exit_status", "messages", "outcome", "timer"], defaults=(None,)
+)
+
+Settings = namedtuple(
+    "Settings",
+    [
+        "author",
+        "current_year",
+        "dry_run",
+        "last_year_present",
+        "start_year_override",
+        "minified",
+        "collect_stats",
+        "collect_spans",
+    ],
+    defaults=(False, False),
+)
+
+
+def _check_file(file, comment_style, settings, timer=None):
+    """Read the header of ``file`` and decide whether it must be updated.
+
+    The start of the file is read as bytes and never decoded: binary files are
+    skipped, and the license notice is found with byte regular expressions. If a
+    ``timer`` is given, the time spent reading and validating the header, and the
+    number of bytes read, are recorded in it.
+    """
+    with open(file, mode="rb") as f:
+        return _check_stream(f, file, comment_style, settings, timer)
+
+
+def _check_stream(f, file, comment_style, settings, timer=None):
+    """Check the header of ``file``, read from the buffered binary stream ``f``.
+
+    ``f`` must be at the start of the content, and support ``peek``. ``file`` is
+    only used to name the content.
+    """
+    prefix = f.peek(BINARY_SNIFF_SIZE)
+    if looks_binary(prefix):
+        if timer is not None:
+            timer.bytes_read += len(prefix)
+            timer.lap("read")
+        return HeaderCheck(file, comment_style, "binary", None, None, None, None, None)
+    file_header, first_line, special_openning_lines = read_file_header_bytes(
+        f, LICENSE_LENGTH
+    )
+    if timer is not None:
+        timer.bytes_read += f.tell()
+        timer.lap("read")
+    if settings.minified != "insert" and looks_minified(file, file_header):
+        if timer is not None:
+            timer.lap("validate")
+        return HeaderCheck(
+            file, comment_style, "minified", None, None, None, None, None
+        )
+
+    # Check whether license header is missing
+    (has_license_notice, must_update_license_notice, start_year, end_year) = (
+        _validate_notice(
+            HEADER_MATCHER.match_bytes(first_line),
+            settings.current_year,
+            settings.author.encode(),
+            settings.last_year_present,
+            settings.start_year_override,
+        )
+    )
+    if timer is not None:
+        timer.lap("validate")
+    return HeaderCheck(
+        file,
+        comment_style,
+        False,
+        has_license_notice,
+        must_update_license_notice,
+        start_year,
+        end_year,
+        special_openning_lines,
+        _line_ending(next(iter(special_openning_lines.values()), first_line)),
+    )
+
+
+def _line_ending(line):
+    if line.endswith(b"\r\n"):
+        return "\r\n"
+    if line.endswith(b"\n"):
+        return "\n"
+    return None
+
+
+def _header_data(check, settings, newline=None):
+    """Return the encoded license header of a checked file.
+
+    The lines of the header end like the lines of the file, or with ``newline`` if
+    the line ending of the file is not known, ``os.linesep`` by default.
+    """
+    text = render_license_header(
+        settings.author, f"{check.start_year} - {check.end_year}", **check.comment_style
+    ).text
+    return _encode_header(text, check.newline or newline or os.linesep)
+
+
+def _fix_file(check, settings, timer=None):
+    """Write the license header of a checked file.
+
+    Returns the outcome of the rewrite and the messages to print. If a ``timer`` is
+    given, the number of bytes read and written is recorded in it.
+    """
+    file = check.file
+    header = _header_data(check, settings)
+    if check.has_license_notice and _patch_header(
+        file, len(check.special_openning_lines), header, timer
+    ):
+        return OUTCOME_FIXED, [_fixed_message(check)]
+
+    # Create a new file in the same directory with the header and file
+    # content, then replace the existing one.
+    import shutil
+    import tempfile
+
+    tmp_fd, tmp_name = tempfile.mkstemp(dir=os.path.dirname(file))
+    try:
+        with open(file, "rb") as f:
+            # Keep the special opening lines, and drop the existing header.
+            special_lines_end = _skip_lines(f, len(check.special_openning_lines))
+            body_start = special_lines_end
+            if check.has_license_notice:
+                body_start = _skip_lines(f, LICENSE_LENGTH)
+            _copy_range(f.fileno(), tmp_fd, 0, special_lines_end)
+            _write_all(tmp_fd, header)
+            _copy_range(f.fileno(), tmp_fd, body_start)
+            if timer is not None:
+                timer.bytes_read += os.fstat(f.fileno()).st_size
+                timer.bytes_written += os.lseek(tmp_fd, 0, os.SEEK_CUR)
+        os.close(tmp_fd)
+        tmp_fd = None
+
+        # Copy the metadata of the original file, if supported.
+        shutil.copystat(file, tmp_name)
+        os.replace(tmp_name, file)
+
+        return OUTCOME_FIXED, [_fixed_message(check)]
+    except Exception as e:  # pragma: no cover
+        try:  # pragma: no cover
+            if tmp_fd is not None:  # pragma: no cover
+                os.close(tmp_fd)  # pragma: no cover
+            os.remove(tmp_name)  # pragma: no cover
+        except FileNotFoundError:  # pragma: no cover
+            pass  # pragma: no cover
+        return OUTCOME_ERROR, [f"\033[91m{e}\033[0m"]  # pragma: no cover
+
+
+def _fixed_message(check):
+    if not check.has_license_notice:
+        return f"Applied license header to '{check.file}'."
+    return f"Updated license header in '{check.file}'."
+
+
+def _check_buffer(data, name, comment_style, settings):
+    """Like ``_check_file``, for the content ``data`` of a file named ``name``."""
+    return _check_stream(
+        io.BufferedReader(io.BytesIO(data)), name, comment_style, settings
+    )
+
+
+def _fix_buffer(data, check, settings, text=False):
+    """Return the content ``data`` with the license header of its ``check``.
+
+    The content is spliced as ``_fix_file`` would rewrite a file, so fixing a
+    buffer and writing it gives the same bytes as fixing the file. If the content
+    has no complete line and ``text`` is true, the header ends its lines with
+    ``"\\n"`` rather than ``os.linesep``, like text read in universal newlines mode.
+    """
+    header = _header_data(check, settings, "\n" if text else None)
+    f = io.BytesIO(data)
+    special_lines_end = body_start = _skip_lines(f, len(check.special_openning_lines))
+    if check.has_license_notice:
+        body_start = _skip_lines(f, LICENSE_LENGTH)
+    return b"".join([data[:special_lines_end], header, data[body_start:]])
+
+
+def _skip_lines(f, n_lines):
+    """Move the binary file ``f`` past ``n_lines`` lines and return its position.
+
+    Lines are read in chunks of at most ``COPY_CHUNK_SIZE`` bytes, so that very long
+    lines are never held in memory.
+    """
+    for _ in range(n_lines):
+        chunk = f.readline(COPY_CHUNK_SIZE)
+        while chunk and not chunk.endswith(b"\n"):
+            chunk = f.readline(COPY_CHUNK_SIZE)
+        if not chunk:
+            break
+    return f.tell()
+
+
+def _write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view) :]
+
+
+def _copy_file_range(src_fd, dst_fd, offset, count):
+    return os.copy_file_range(src_fd, dst_fd, count, offset)
+
+
+def _sendfile(src_fd, dst_fd, offset, count):
+    return os.sendfile(dst_fd, src_fd, offset, count)
+
+
+def _read_write(src_fd, dst_fd, offset, count):
+    os.lseek(src_fd, offset, os.SEEK_SET)
+    data = os.read(src_fd, min(count, COPY_CHUNK_SIZE))
+    _write_all(dst_fd, data)
+    return len(data)
+
+
+# Ways of copying a range of bytes between two files, from fastest to slowest. The
+# first ones let the kernel copy the data (or share it, on copy-on-write file
+# systems) without it ever reaching the user space.
+_COPY_FUNCTIONS = [
+    function
+    for function, available in [
+        (_copy_file_range, hasattr(os, "copy_file_range")),
+        (_sendfile, hasattr(os, "sendfile") and sys.platform.startswith("linux")),
+        (_read_write, True),
+    ]
+    if available
+]
+
+
+def _copy_range(src_fd, dst_fd, offset, count=None):
+    """Append ``count`` bytes of ``src_fd`` from ``offset`` to ``dst_fd``.
+
+    If ``count`` is ``None``, everything from ``offset`` to the end of the file is
+    copied. The data is never decoded, and at most ``COPY_CHUNK_SIZE`` bytes are held
+    in memory at once. If a copy function is not supported between these two files,
+    the copy continues with the next one in ``_COPY_FUNCTIONS``.
+    """
+    if count is None:
+        count = os.fstat(src_fd).st_size - offset
+    end = offset + count
+    for copy_function in _COPY_FUNCTIONS:
+        try:
+            while offset < end:
+                copied = copy_function(src_fd, dst_fd, offset, end - offset)
+                if not copied:
+                    # The file was truncated.
+                    return
+                offset += copied
+            return
+        except OSError:
+            if copy_function is _read_write:
+                raise
+
+
+def _patch_header(file, n_special_lines, new_header, timer=None):
+    """Overwrite the existing header of ``file`` in place, if possible.
+
+    The header that follows the ``n_special_lines`` first lines is replaced by the
+    encoded ``new_header`` (see ``RenderedHeader``) only if both have the same size
+    in bytes, as is the case when an end year is bumped. Only the bytes that differ
+    are written, at their offset, so the rest of the file is neither read nor
+    copied. Returns whether the file was patched, otherwise it must be rewritten.
+    """
+    with open(file, "r+b") as f:
+        lines = list(
+            itertools.islice(
+                _iter_lines(f, HEADER_READ_BUDGET, MAX_LINE_LENGTH, newline=b"\n"),
+                n_special_lines + LICENSE_LENGTH,
+            )
+        )
+        offset = sum(len(line) for line in lines[:n_special_lines])
+        old_header = b"".join(lines[n_special_lines:])
+        if len(old_header) != len(new_header):
+            return False
+        changed = [i for i, (a, b) in enumerate(zip(old_header, new_header)) if a != b]
+        if changed:
+            start, end = changed[0], changed[-1] + 1
+            f.seek(offset + start)
+            f.write(new_header[start:end])
+            if timer is not None:
+                timer.bytes_written += end - start
+        if timer is not None:
+            timer.bytes_read += offset + len(old_header)
+    return True
+
+
+def _needs_fix(check, settings):
+    """Whether the header of a checked file must be written."""
+    return not (
+        settings.dry_run
+        or check.skipped
+        or (check.has_license_notice and not check.must_update_license_notice)
+    )
+
+
+def _outcome(check):
+    """Classify a ``HeaderCheck`` into one of the ``OUTCOME_*`` constants."""
+    if check.skipped == "binary":
+        return OUTCOME_BINARY
+    if check.skipped:
+        return OUTCOME_SKIPPED
+    if not check.has_license_notice:
+        return OUTCOME_MISSING
+    if check.must_update_license_notice:
+        return OUTCOME_OUTDATED
+    return OUTCOME_OK
+
+
+def _report(file, outcome, settings):
+    """Return the ``Result`` of a file whose check had the given outcome.
+
+    ``outcome`` must not require writing the file, i.e. it must be ``OUTCOME_OK``,
+    ``OUTCOME_SKIPPED``, ``OUTCOME_BINARY`` or, in a dry run, ``OUTCOME_MISSING`` or
+    ``OUTCOME_OUTDATED``.
+    """
+    if outcome == OUTCOME_BINARY:
+        return Result(0, [], outcome)
+    if outcome == OUTCOME_SKIPPED:
+        if settings.minified == "warn":
+            return Result(
+                0, [f"Skipping minified or generated file '{file}'."], outcome
+            )
+        return Result(0, [], outcome)
+    if outcome == OUTCOME_MISSING:
+        return Result(1, [f"No license header found in '{file}'."], outcome)
+    if outcome == OUTCOME_OUTDATED:
+        return Result(
+            1, [f"Must update existing license header found in '{file}'."], outcome
+        )
+    return Result(0, [], outcome)
+
+
+def _finish_check(check, settings, timer=None):
+    """Fix the checked file if needed, and return its ``Result``.
+
+    If a ``timer`` is given, the rewrite is timed and the timer is attached to the
+    ``Result``.
+    """
+    if _needs_fix(check, settings):
+        outcome, messages = _fix_file(check, settings, timer)
+        if timer is None:
+            return Result(1, messages, outcome)
+        timer.lap("rewrite")
+        if outcome == OUTCOME_FIXED:
+            timer.action = "updated" if check.has_license_notice else "inserted"
+        return Result(1, messages, outcome, timer)
+    result = _report(check.file, _outcome(check), settings)
+    return result if timer is None else result._replace(timer=timer)
+
+
+def _process_file(task):
+    """Check and, if needed, fix the header of a single file.
+
+    ``task`` is a ``(file, comment_style, settings)`` tuple, so that this function can
+    be mapped over a process pool. Returns a ``Result`` with the exit status for the
+    file, the messages to print and the outcome of the check.
+    """
+    file, comment_style, settings = task
+    if not settings.collect_stats:
+        return _finish_check(_check_file(file, comment_style, settings), settings)
+    from .stats import FileTimer
+
+    timer = FileTimer(spans=settings.collect_spans)
+    return _finish_check(
+        _check_file(file, comment_style, settings, timer), settings, timer
+    )
+
+
+def _process_item(item):
+    task, result = item
+    return result if result is not None else _process_file(task)
+
+
+def _process_items(items):
+    return [_process_item(item) for item in items]
+
+
+def _map_files(items, jobs):
+    """Process the ``(task, result)`` ``items`` iterable, in parallel if possible.
+
+    Tasks are passed to ``_process_file``, unless their ``result`` is already known
+    (e.g. from the cache). Results are yielded in the same order as ``items``, which
+    are consumed lazily, and only a bounded window of them is submitted ahead of the
+    results being consumed, so memory use does not grow with the number of files.
+    Runs over a few files use a thread pool, which is cheap to start and overlaps the
+    file I/O, while runs over at least ``PROCESS_POOL_MIN_FILES`` files use a process
+    pool to also spread the CPU bound work over several cores.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    items = iter(items)
+    if jobs <= 1:
+        yield from map(_process_item, items)
+        return
+    head = list(itertools.islice(items, PROCESS_POOL_MIN_FILES))
+    use_threads = len(head) < PROCESS_POOL_MIN_FILES
+    if use_threads and len(head) <= 1:
+        yield from map(_process_item, head)
+        return
+    items = itertools.chain(head, items)
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    if use_threads:
+        executor = ThreadPoolExecutor(max_workers=min(jobs, len(head)))
+        chunksize = 1
+    else:
+        executor = ProcessPoolExecutor(max_workers=jobs)
+        chunksize = PROCESS_POOL_CHUNK_SIZE
+    del head
+
+    with executor:
+        pending = deque()
+        while True:
+            chunk = list(itertools.islice(items, chunksize))
+            if chunk:
+                pending.append(executor.submit(_process_items, chunk))
+            if pending and (not chunk or len(pending) >= 4 * jobs):
+                yield from pending.popleft().result()
+            elif not chunk:
+                return
+
+
+def _stat_key(file):
+    from .cache import stat_key
+
+    try:
+        return stat_key(os.stat(file))
+    except OSError:
+        return None
+
+
+def _can_report(outcome, settings):
+    """Whether a cached ``outcome`` can be reported without checking the file again."""
+    return outcome in (OUTCOME_OK, OUTCOME_SKIPPED, OUTCOME_BINARY) or (
+        settings.dry_run and outcome in (OUTCOME_MISSING, OUTCOME_OUTDATED)
+    )
+
+
+def _blob_kind(file, style):
+    # Besides its content, only the comment style and the name of a file affect
+    # the outcome of its check.
+    return f"{style}-min" if ".min." in file.name else style
+
+
+def _merge_mapping(mapping):
+    """Extend ``FILE_TYPE_MAPPING`` with ``(file_type, style)`` pairs."""
+    file_type_mappings = FILE_TYPE_MAPPING.copy()
+    mapping = mapping or {}
+    for file_type, style in mapping:
+        file_type_mappings[file_type] = style
+    return file_type_mappings
+
+
 def _main(
     paths,
     author,
@@ -244,178 +1288,566 @@ def _main(
     dry_run,
     last_year_present,
     start_year_override=None,
+    use_default_excludes=True,
+    discovery="walk",
+    ignore_files=None,
+    minified="insert",
+    jobs=None,
+    pipeline=False,
+    cache_dir=None,
+    shared_cache_dir=None,
+    shared_cache_read_only=False,
+    changed_since=None,
+    staged=False,
+    stats=None,
 ):
     """Check for Apache 2.0 license headers in one or multiple files.
 
     The given paths can be either single files and/or directories that will be searched
-    recursively for suitable file types to apply the header on.
+    recursively for suitable file types to apply the header on. Files are processed
+    by up to ``jobs`` workers (one per CPU by default), and messages are printed in
+    the order in which the files were found. If ``pipeline`` is set, the files are
+    processed by the asyncio pipeline of ``head_of_apache.pipeline``, which starts
+    checking files while the discovery goes on. If ``cache_dir`` is given, the
+    outcome of every check is stored there, and unchanged files are not read again
+    in later runs with the same options. If ``shared_cache_dir`` is given, the
+    outcomes of clean files tracked by git are also stored there by content, so that
+    other clones or machines can reuse them (see ``head_of_apache.cache.BlobCache``).
+    With ``changed_since`` or ``staged``, only the files changed since a git
+    revision or staged in the index are checked (see ``get_files``). If ``stats``
+    is a ``head_of_apache.stats.Stats``, the timings and counters of the run are
+    added to it. Neither the caches nor ``stats`` are supported by the
+    ``pipeline``. The spans of the run
+    are published to the subscribers of ``head_of_apache.trace``, if any.
     """
     if os.name == "nt":
         os.system("color")
-    file_type_mappings = FILE_TYPE_MAPPING.copy()
-    mapping = mapping or {}
-    for file_type, style in mapping:
-        file_type_mappings[file_type] = style
+    if pipeline:
+        if stats is not None:
+            raise ValueError("Statistics cannot be collected by the pipeline.")
+        if cache_dir is not None or shared_cache_dir is not None:
+            raise ValueError("The pipeline does not use the caches.")
+        import asyncio
 
-    files = get_files(paths, exclude, file_type_mappings)
+        from . import pipeline
 
-    # Check for missing license headers.
-    exit_status = 0
-    for file in files:
-        # Ignore files with non-matching extensions.
-        file_type_mapping = file_type_mappings[file.suffix[1:]]
-        comment_style = COMMENT_STYLES[file_type_mapping]
+        return asyncio.run(
+            pipeline.run(
+                paths,
+                author,
+                mapping=mapping,
+                exclude=exclude,
+                dry_run=dry_run,
+                last_year_present=last_year_present,
+                start_year_override=start_year_override,
+                use_default_excludes=use_default_excludes,
+                discovery=discovery,
+                ignore_files=ignore_files,
+                minified=minified,
+                jobs=jobs,
+                changed_since=changed_since,
+                staged=staged,
+            )
+        )
+    file_type_mappings = _merge_mapping(mapping)
 
-        # Check the file for an existing header.
-        with open(file, mode="r+", encoding="utf-8") as f:
-            # Create the fitting license header for the current file.
-            current_year = f"{datetime.now(timezone.utc).year}"
+    files = get_files(
+        paths,
+        exclude,
+        file_type_mappings,
+        default_excludes=DEFAULT_EXCLUDES if use_default_excludes else None,
+        discovery=discovery,
+        ignore_files=ignore_files,
+        changed_since=changed_since,
+        staged=staged,
+    )
+    if stats is not None:
+        files = stats.timed(files, "discovery")
+    tracing = trace.enabled()
+    settings = Settings(
+        author=author,
+        current_year=_current_year(),
+        dry_run=dry_run,
+        last_year_present=last_year_present,
+        start_year_override=start_year_override,
+        minified=minified,
+        collect_stats=stats is not None or tracing,
+        collect_spans=tracing,
+    )
+    result_cache = None
+    blob_cache = None
+    if cache_dir is not None or shared_cache_dir is not None:
+        from .cache import BlobCache, ResultCache, fingerprint
 
-            _, first_line, special_openning_lines = read_file_header_lines(
-                f, comment_style, LICENSE_LENGTH
+        options_fingerprint = fingerprint(
+            version=__version__,
+            author=author,
+            current_year=settings.current_year,
+            last_year_present=last_year_present,
+            start_year_override=start_year_override,
+            minified=minified,
+            mapping=file_type_mappings,
+            header_read_budget=HEADER_READ_BUDGET,
+            max_line_length=MAX_LINE_LENGTH,
+            binary_sniff_size=BINARY_SNIFF_SIZE,
+        )
+        if cache_dir is not None:
+            result_cache = ResultCache.open(cache_dir, options_fingerprint)
+        if shared_cache_dir is not None:
+            blob_cache = BlobCache(
+                shared_cache_dir, options_fingerprint, read_only=shared_cache_read_only
             )
-
-            # Check whether license header is missing
-            (has_license_notice, must_update_license_notice, start_year, end_year) = (
-                validate_file_header(
-                    first_line=first_line,
-                    current_year=current_year,
-                    author=author,
-                    last_year_present=last_year_present,
-                    start_year_override=start_year_override,
+            blob_index = git.BlobIndex()
+            for path in paths:
+                blob_index.add(
+                    path if os.path.isdir(path) else os.path.dirname(path) or "."
                 )
-            )
 
-        if not has_license_notice or must_update_license_notice:
-            exit_status = 1
-            if dry_run:
-                if not has_license_notice:
-                    print(f"No license header found in '{file}'.", file=sys.stdout)
-                else:
-                    print(
-                        f"Must update existing license header found in '{file}'.",
-                        file=sys.stdout,
-                    )
-            else:
-                license_header = get_license_header(
-                    author, f"{start_year} - {end_year}", **comment_style
-                )
-                with open(file, encoding="utf-8") as f:
-                    file_content = f.readlines()
+    # Files in flight with their stat keys and content keys, in the order in which
+    # results come back. A key is ``None`` if the outcome must not be stored.
+    pending = deque()
 
-                # Create a new file in the same directory with the header and file
-                # content, then replace the existing one.
-                tmp_file = tempfile.NamedTemporaryFile(
-                    mode="w", dir=os.path.dirname(file), delete=False
-                )
+    def items():
+        for file in files:
+            style = file_type_mappings[file.suffix[1:]]
+            task = (file, COMMENT_STYLES[style], settings)
+            result = key = blob = None
+            if result_cache is not None:
+                key = _stat_key(file)
+                outcome = result_cache.get(file, key) if key is not None else None
+                if _can_report(outcome, settings):
+                    result = _report(file, outcome, settings)
+                    key = None
+            if blob_cache is not None and result is None:
+                object_name = blob_index.get(file)
+                if object_name is not None:
+                    blob = (object_name, _blob_kind(file, style))
+                    outcome = blob_cache.get(*blob)
+                    if _can_report(outcome, settings):
+                        result = _report(file, outcome, settings)
+                        blob = None
+            if stats is not None:
+                stats.count("scanned")
+                if result is not None:
+                    stats.count("cached")
+            pending.append((file, key, blob))
+            yield task, result
 
-                try:
-                    for special_openning_line in special_openning_lines.values():
-                        tmp_file.write(special_openning_line)
-                    tmp_file.write(license_header + "\n")
-                    if has_license_notice:
-                        tmp_file.write(
-                            "".join(
-                                file_content[
-                                    len(license_header.split("\n"))
-                                    + len(special_openning_lines) :
-                                ]
-                            )
-                        )
-                    else:
-                        tmp_file.write("".join(file_content))
-
-                    tmp_file.close()
-
-                    # Copy the metadata of the original file, if supported.
-                    shutil.copystat(file, tmp_file.name)
-                    os.replace(tmp_file.name, file)
-
-                    if not has_license_notice:
-                        print(f"Applied license header to '{file}'.", file=sys.stdout)
-                    else:
-                        print(f"Updated license header in '{file}'.", file=sys.stdout)
-                except Exception as e:  # pragma: no cover
-                    print(
-                        f"\033[91m{e}\033[0m", fg="red", file=sys.stdout
-                    )  # pragma: no cover
-
-                    try:  # pragma: no cover
-                        os.remove(tmp_file.name)  # pragma: no cover
-                    except FileNotFoundError:  # pragma: no cover
-                        pass  # pragma: no cover
+    # Check for missing license headers.
+    exit_status = 0
+    try:
+        for result in _map_files(items(), jobs):
+            file, key, blob = pending.popleft()
+            exit_status = max(exit_status, result.exit_status)
+            for message in result.messages:
+                print(message, file=sys.stdout)
+            if stats is not None:
+                if result.timer is not None:
+                    stats.add_file(file, result.timer)
+                if result.outcome in _OUTCOME_COUNTERS:
+                    stats.count(_OUTCOME_COUNTERS[result.outcome])
+            if tracing and result.timer is not None:
+                trace.publish_file(file, result.timer, result.outcome)
+            if result.outcome == OUTCOME_ERROR:
+                continue
+            if result.outcome == OUTCOME_FIXED:
+                # The content changed, so only the stat key can be updated.
+                key = key and _stat_key(file)
+                outcome, blob = OUTCOME_OK, None
+            else:
+                outcome = result.outcome
+            if key is not None:
+                result_cache.put(file, key, outcome)
+            if blob is not None:
+                blob_cache.put(*blob, outcome)
+    finally:
+        if result_cache is not None:
+            result_cache.close()
+        if stats is not None:
+            stats.stop()
     return exit_status
 
 
-parser = argparse.ArgumentParser(
-    prog="head_of_apache",
-    description=(
-        "Add or update the Apache v2 license header to source code files in the "
-        "desired path."
-    ),
-)
-parser.add_argument(
-    "-a",
-    "--author",
-    required=True,
-    help="The author to use in the license header.",
-)
-parser.add_argument(
-    "-m",
-    "--mapping",
-    nargs=2,
-    action="append",
-    help=(
-        "Overwrite existing or add additional file types to the default file/comment"
-        " style mapping. Possible comment styles are 'asterisk', 'hash', 'html' and "
-        "'jinja'."
-    ),
-)
-parser.add_argument(
-    "-x",
-    "--exclude",
-    action="append",
-    help=(
-        "A path to exclude. A file will be excluded if it starts with the given path."
-        " Can be specified more than once."
-    ),
-    type=Path,
-)
-parser.add_argument(
-    "-d",
-    "--dry-run",
-    action="store_true",
-    help="Notify about missing license headers, but do not apply them.",
-)
-parser.add_argument(
-    "-l",
-    "--last-year-present",
-    action="store_true",
-    help="If set, the license last year is set to 'present'.",
-)
-parser.add_argument(
-    "paths",
-    nargs="*",
-    type=Path,
-    help=(
-        "Paths in which to look for source code files to apply the Apache license "
-        "header. If none is provided, the current working directory is used."
-    ),
-)
-parser.add_argument(
-    "--start-year",
-    type=int,
-    default=None,
-    help=(
-        "If present, this year will overwrite the start year found in all matched "
-        "scripts. If absent, the existing start year will be preserved, and if there "
-        "is no start year present, the current year (the year at which head_of_apache "
-        "was called) will be used in the license header."
-    ),
-)
+def _build_parser():
+    import argparse
+
+    from .cache import DEFAULT_CACHE_DIR
+
+    parser = argparse.ArgumentParser(
+        prog="head_of_apache",
+        description=(
+            "Add or update the Apache v2 license header to source code files in the "
+            "desired path."
+        ),
+    )
+    parser.add_argument(
+        "-a",
+        "--author",
+        required=True,
+        help="The author to use in the license header.",
+    )
+    parser.add_argument(
+        "-m",
+        "--mapping",
+        nargs=2,
+        action="append",
+        help=(
+            "Overwrite existing or add additional file types to the default "
+            "file/comment style mapping. Possible comment styles are 'asterisk', "
+            "'hash', 'html' and 'jinja'."
+        ),
+    )
+    parser.add_argument(
+        "-x",
+        "--exclude",
+        action="append",
+        help=(
+            "A path or glob pattern to exclude. A file will be excluded if it starts "
+            "with the given path. Patterns without a '/' (e.g. '*.min.js') are matched "
+            "against the names of files and directories at any depth, other paths and "
+            "patterns are relative to the current working directory. Excluded "
+            "directories are not traversed. Can be specified more than once."
+        ),
+        type=Path,
+    )
+    parser.add_argument(
+        "--no-default-excludes",
+        dest="use_default_excludes",
+        action="store_false",
+        help=(
+            "Also traverse the version control, virtual environment, cache and vendor "
+            "directories (e.g. '.git', 'node_modules' or '__pycache__') that are "
+            "skipped by default."
+        ),
+    )
+    parser.add_argument(
+        "--discovery",
+        choices=["walk", "git"],
+        default="walk",
+        help=(
+            "How to search directories for source code files. 'walk' (the default) "
+            "traverses the file system, while 'git' lists the files tracked in the git "
+            "index, so untracked and ignored files are never visited. Directories that "
+            "are not inside of a git working tree are always walked."
+        ),
+    )
+    parser.add_argument(
+        "--ignore-file",
+        dest="ignore_files",
+        action="append",
+        metavar="NAME",
+        help=(
+            "Name of a gitignore style file (e.g. '.gitignore' or '.dockerignore') "
+            "whose rules are applied while walking directories. The files with this "
+            "name found in every searched directory are read, and the files and "
+            "directories they match are skipped. Patterns in '.dockerignore' files are "
+            "relative to the directory that holds them. Can be specified more than "
+            "once."
+        ),
+    )
+    parser.add_argument(
+        "--minified",
+        choices=MINIFIED_POLICIES,
+        default="insert",
+        help=(
+            "What to do with files that look minified or generated: files named like "
+            "'*.min.*', files whose first lines are very long, or that contain an "
+            "'@generated' or 'DO NOT EDIT' marker. 'insert' (the default) checks and "
+            "fixes their header like for any other file, 'warn' leaves them untouched "
+            "and prints a warning, and 'skip' silently leaves them untouched. In every "
+            "case, only a bounded prefix of the file is read to check the header."
+        ),
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help=(
+            "Number of files to check and fix in parallel. Defaults to the number of "
+            "CPUs. Messages are always printed in the order in which the files are "
+            "found."
+        ),
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help=(
+            "Process the files with an asyncio pipeline, in which discovery, header "
+            "checks and rewrites run concurrently, connected by bounded queues. The "
+            "first results are printed while the search for files is still going on."
+        ),
+    )
+    parser.add_argument(
+        "--changed-since",
+        metavar="REF",
+        help=(
+            "Only check the files that were added, modified or renamed since the git "
+            "revision REF, including uncommitted changes. The candidates are read from "
+            "git instead of walking the paths."
+        ),
+    )
+    parser.add_argument(
+        "--staged",
+        action="store_true",
+        help=(
+            "Only check the files whose changes are staged in the git index. Combined "
+            "with --changed-since, check the changes staged since REF."
+        ),
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        help=(
+            "Directory of the cache of check results. Files whose size, modification "
+            f"time and inode did not change since the last run are not read again. "
+            f"Defaults to '{DEFAULT_CACHE_DIR}' in the current working directory. "
+            "Not used with --pipeline."
+        ),
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read nor write the cache of check results.",
+    )
+    parser.add_argument(
+        "--shared-cache",
+        type=Path,
+        dest="shared_cache_dir",
+        help=(
+            "Directory of a cache of check results keyed by the git object name of the "
+            "content of tracked files. It can be shared by concurrent runs, and saved "
+            "and restored across clones and CI machines. Not supported with "
+            "--pipeline."
+        ),
+    )
+    parser.add_argument(
+        "--shared-cache-read-only",
+        action="store_true",
+        help="Only read the shared cache, never add entries to it.",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help=(
+            "Print the wall and CPU time spent in each phase (discovery, header read, "
+            "validation and rewrite), the number of files scanned, skipped, updated "
+            "and inserted, the bytes read and written, and the slowest files to "
+            "stderr. Not supported with --pipeline nor --serve."
+        ),
+    )
+    parser.add_argument(
+        "--stats-json",
+        type=Path,
+        metavar="PATH",
+        help="Write the same statistics as --stats to PATH, as JSON.",
+    )
+    parser.add_argument(
+        "--trace",
+        type=Path,
+        metavar="PATH",
+        help=(
+            "Write a Chrome trace event file to PATH, with a span for every directory "
+            "listed, every file checked and each of its phases, on one track per "
+            "worker. It can be opened with chrome://tracing or "
+            "https://ui.perfetto.dev. Not supported with --pipeline nor --serve."
+        ),
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help=(
+            "Start a server that keeps the outcomes of the files in the given paths in "
+            "memory, watches them for changes and answers the requests of "
+            "'python -m head_of_apache.client' on a Unix socket. Only the files that "
+            "changed since the previous request are checked again."
+        ),
+    )
+    parser.add_argument(
+        "--socket",
+        type=Path,
+        default=Path(".head_of_apache.sock"),
+        help="Path of the Unix socket of --serve. Defaults to '.head_of_apache.sock'.",
+    )
+    parser.add_argument(
+        "--audit",
+        action="append",
+        metavar="REF",
+        help=(
+            "Report the files that lack a correct license header in the git revision "
+            "REF (e.g. a release tag), without checking it out and without changing "
+            "anything. Headers must cover the year of the commit of REF. Files with "
+            "the same content in several revisions are only checked once. Can be "
+            "specified more than once."
+        ),
+    )
+    parser.add_argument(
+        "--archives",
+        action="store_true",
+        help=(
+            "Check the files inside of the given paths, which must be tar archives "
+            "(e.g. '.tar.gz' or '.tar.xz' source distributions), zip archives or "
+            "wheels, instead of the paths themselves. Archives are read as a stream "
+            "and never extracted, only the start of each member is read, and nothing "
+            "is changed. The file type mapping and the excludes apply to the names of "
+            "the members, as if the archive was extracted in the current working "
+            "directory."
+        ),
+    )
+    parser.add_argument(
+        "-d",
+        "--dry-run",
+        action="store_true",
+        help="Notify about missing license headers, but do not apply them.",
+    )
+    parser.add_argument(
+        "-l",
+        "--last-year-present",
+        action="store_true",
+        help="If set, the license last year is set to 'present'.",
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        type=Path,
+        help=(
+            "Paths in which to look for source code files to apply the Apache license "
+            "header. If none is provided, the current working directory is used."
+        ),
+    )
+    parser.add_argument(
+        "--start-year",
+        type=int,
+        default=None,
+        help=(
+            "If present, this year will overwrite the start year found in all matched "
+            "scripts. If absent, the existing start year will be preserved, and if "
+            "there is no start year present, the current year (the year at which "
+            "head_of_apache was called) will be used in the license header."
+        ),
+    )
+    return parser
+
+
+def _get_parser():
+    parser = globals().get("parser")
+    if parser is None:
+        parser = globals()["parser"] = _build_parser()
+    return parser
+
+
+def __getattr__(name):
+    # The command line parser is only built when it is first needed, so that
+    # importing this module does not pay for it.
+    if name == "parser":
+        return _get_parser()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _serve(parser, parsed_args, paths, start_year_override):
+    import socket
+
+    from . import server
+
+    if not hasattr(socket, "AF_UNIX"):
+        parser.error("--serve requires Unix sockets, which are not available")
+    if parsed_args.changed_since is not None or parsed_args.staged:
+        parser.error("--serve cannot be used with --changed-since nor --staged")
+    if parsed_args.stats or parsed_args.stats_json is not None:
+        parser.error("--serve cannot be used with --stats nor --stats-json")
+    if parsed_args.trace is not None:
+        parser.error("--serve cannot be used with --trace")
+    try:
+        server.Server(
+            paths,
+            parsed_args.author,
+            mapping=parsed_args.mapping,
+            exclude=parsed_args.exclude,
+            last_year_present=parsed_args.last_year_present,
+            start_year_override=start_year_override,
+            use_default_excludes=parsed_args.use_default_excludes,
+            discovery=parsed_args.discovery,
+            ignore_files=parsed_args.ignore_files,
+            minified=parsed_args.minified,
+            jobs=parsed_args.jobs,
+        ).serve(parsed_args.socket)
+    except FileExistsError as e:
+        parser.error(str(e))
+    return 0
+
+
+def _check_archives(parser, parsed_args, paths, start_year_override):
+    from .archive import ArchiveError, check_archives
+
+    if (
+        parsed_args.serve
+        or parsed_args.pipeline
+        or parsed_args.changed_since is not None
+        or parsed_args.staged
+        or parsed_args.audit
+    ):
+        parser.error(
+            "--archives cannot be used with --serve, --pipeline, --changed-since, "
+            "--staged nor --audit"
+        )
+    if (
+        parsed_args.stats
+        or parsed_args.stats_json is not None
+        or parsed_args.trace is not None
+    ):
+        parser.error("--archives cannot be used with --stats, --stats-json nor --trace")
+    try:
+        return check_archives(
+            paths,
+            parsed_args.author,
+            mapping=parsed_args.mapping,
+            exclude=parsed_args.exclude,
+            last_year_present=parsed_args.last_year_present,
+            start_year_override=start_year_override,
+            use_default_excludes=parsed_args.use_default_excludes,
+            minified=parsed_args.minified,
+        )
+    except ArchiveError as e:
+        parser.error(str(e))
+
+
+def _audit(parser, parsed_args, paths, start_year_override):
+    from .audit import audit
+
+    if (
+        parsed_args.serve
+        or parsed_args.pipeline
+        or parsed_args.changed_since is not None
+        or parsed_args.staged
+    ):
+        parser.error(
+            "--audit cannot be used with --serve, --pipeline, --changed-since nor "
+            "--staged"
+        )
+    if (
+        parsed_args.stats
+        or parsed_args.stats_json is not None
+        or parsed_args.trace is not None
+    ):
+        parser.error("--audit cannot be used with --stats, --stats-json nor --trace")
+    try:
+        return audit(
+            paths,
+            parsed_args.audit,
+            parsed_args.author,
+            mapping=parsed_args.mapping,
+            exclude=parsed_args.exclude,
+            last_year_present=parsed_args.last_year_present,
+            start_year_override=start_year_override,
+            use_default_excludes=parsed_args.use_default_excludes,
+            minified=parsed_args.minified,
+        )
+    except git.GitError as e:
+        parser.error(str(e))
 
 
 def main(args=None):
+    parser = _get_parser()
     parsed_args = parser.parse_args(args)
     paths: list[Path] = parsed_args.paths
     if not paths:
@@ -431,15 +1863,74 @@ def main(args=None):
         start_year_override = str(parsed_args.start_year)
     else:
         start_year_override = None
-    return _main(
-        paths,
-        author,
-        mapping,
-        exclude,
-        dry_run,
-        last_year_present,
-        start_year_override=start_year_override,
-    )
+    if parsed_args.archives:
+        return _check_archives(parser, parsed_args, paths, start_year_override)
+    if parsed_args.audit:
+        return _audit(parser, parsed_args, paths, start_year_override)
+    if parsed_args.serve:
+        return _serve(parser, parsed_args, paths, start_year_override)
+    cache_dir = None
+    if parsed_args.pipeline:
+        if (
+            parsed_args.cache_dir is not None
+            or parsed_args.shared_cache_dir is not None
+            or parsed_args.shared_cache_read_only
+        ):
+            parser.error(
+                "--cache-dir, --shared-cache and --shared-cache-read-only cannot be "
+                "used with --pipeline"
+            )
+    elif not parsed_args.no_cache:
+        from .cache import DEFAULT_CACHE_DIR
+
+        cache_dir = parsed_args.cache_dir or Path(DEFAULT_CACHE_DIR)
+    stats = None
+    if parsed_args.stats or parsed_args.stats_json is not None:
+        if parsed_args.pipeline:
+            parser.error("--stats and --stats-json cannot be used with --pipeline")
+        from .stats import Stats
+
+        stats = Stats()
+    trace_writer = None
+    if parsed_args.trace is not None:
+        if parsed_args.pipeline:
+            parser.error("--trace cannot be used with --pipeline")
+        trace_writer = trace.ChromeTraceWriter(parsed_args.trace)
+        trace.subscribe(trace_writer)
+    try:
+        exit_status = _main(
+            paths,
+            author,
+            mapping,
+            exclude,
+            dry_run,
+            last_year_present,
+            start_year_override=start_year_override,
+            use_default_excludes=parsed_args.use_default_excludes,
+            discovery=parsed_args.discovery,
+            ignore_files=parsed_args.ignore_files,
+            minified=parsed_args.minified,
+            jobs=parsed_args.jobs,
+            pipeline=parsed_args.pipeline,
+            cache_dir=cache_dir,
+            shared_cache_dir=parsed_args.shared_cache_dir,
+            shared_cache_read_only=parsed_args.shared_cache_read_only,
+            changed_since=parsed_args.changed_since,
+            staged=parsed_args.staged,
+            stats=stats,
+        )
+    except git.GitError as e:
+        parser.error(str(e))
+    finally:
+        if trace_writer is not None:
+            trace.unsubscribe(trace_writer)
+            trace_writer.close()
+    if parsed_args.stats:
+        print(stats.format(), file=sys.stderr)
+    if parsed_args.stats_json is not None:
+        with open(parsed_args.stats_json, "w") as f:
+            stats.dump(f)
+    return exit_status
 
 
 if __name__ == "__main__":
@@ -0,0 +1,217 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""asyncio pipeline that overlaps file discovery, header checks and rewrites.
+
+The stages are connected by bounded queues, so a slow stage applies backpressure
+to the previous ones and memory use does not grow with the size of the tree. All
+blocking file system calls run in an executor. Results are produced in the order
+in which the files are discovered.
+"""
+
+import asyncio
+import itertools
+import sys
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .exclude import DEFAULT_EXCLUDES
+from .main import (
+    COMMENT_STYLES,
+    Settings,
+    _check_file,
+    _current_year,
+    _finish_check,
+    _merge_mapping,
+    _needs_fix,
+    get_files,
+)
+
+# Maximum number of items waiting between two stages of the pipeline.
+QUEUE_SIZE = 256
+# Number of files pulled from the discovery generator per executor call.
+DISCOVERY_BATCH_SIZE = 64
+
+FileResult = namedtuple("FileResult", ["file", "exit_status", "messages"])
+
+_DONE = object()
+
+
+class _Failure:
+    """Carries the exception raised in a stage down to the consumer."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def _discard(queue):
+    """Drop the items left in ``queue``, cancelling or collecting their futures."""
+    while not queue.empty():
+        item = queue.get_nowait()
+        if isinstance(item, tuple):
+            item = item[1]
+        if not isinstance(item, asyncio.Future):
+            continue
+        if not item.done():
+            item.cancel()
+        elif not item.cancelled():
+            # Mark the exception as retrieved, it is not the one being raised.
+            item.exception()
+
+
+def _take(iterator, n):
+    return list(itertools.islice(iterator, n))
+
+
+async def _discover(loop, executor, files, outbox):
+    try:
+        while True:
+            batch = await loop.run_in_executor(
+                executor, _take, files, DISCOVERY_BATCH_SIZE
+            )
+            for file in batch:
+                await outbox.put(file)
+            if len(batch) < DISCOVERY_BATCH_SIZE:
+                break
+    except Exception as e:
+        await outbox.put(_Failure(e))
+    else:
+        await outbox.put(_DONE)
+
+
+async def _check(loop, executor, file_type_mappings, settings, inbox, outbox):
+    while True:
+        file = await inbox.get()
+        if file is _DONE or isinstance(file, _Failure):
+            await outbox.put(file)
+            return
+        comment_style = COMMENT_STYLES[file_type_mappings[file.suffix[1:]]]
+        await outbox.put(
+            loop.run_in_executor(executor, _check_file, file, comment_style, settings)
+        )
+
+
+async def _write(loop, executor, settings, inbox, outbox):
+    while True:
+        pending_check = await inbox.get()
+        if pending_check is _DONE or isinstance(pending_check, _Failure):
+            await outbox.put(pending_check)
+            return
+        try:
+            check = await pending_check
+        except Exception as e:
+            await outbox.put(_Failure(e))
+            return
+        if _needs_fix(check, settings):
+            result = loop.run_in_executor(executor, _finish_check, check, settings)
+        else:
+            result = loop.create_future()
+            result.set_result(_finish_check(check, settings))
+        await outbox.put((check.file, result))
+
+
+async def iter_results(
+    paths,
+    author,
+    mapping=None,
+    exclude=None,
+    dry_run=False,
+    last_year_present=False,
+    start_year_override=None,
+    use_default_excludes=True,
+    discovery="walk",
+    ignore_files=None,
+    minified="insert",
+    jobs=None,
+    changed_since=None,
+    staged=False,
+    executor=None,
+    queue_size=QUEUE_SIZE,
+):
+    """Asynchronously check and fix the license headers of the files in ``paths``.
+
+    This is an asynchronous generator that yields a ``FileResult`` for every file as
+    soon as it has been processed, while the discovery of the following files goes
+    on. The arguments have the same meaning as for ``head_of_apache.main._main``. The
+    blocking work runs in ``executor``, which defaults to a thread pool of ``jobs``
+    workers owned by the pipeline, and at most ``queue_size`` items wait between two
+    stages.
+    """
+    loop = asyncio.get_running_loop()
+    file_type_mappings = _merge_mapping(mapping)
+    settings = Settings(
+        author=author,
+        current_year=_current_year(),
+        dry_run=dry_run,
+        last_year_present=last_year_present,
+        start_year_override=start_year_override,
+        minified=minified,
+    )
+    files = get_files(
+        paths,
+        exclude,
+        file_type_mappings,
+        default_excludes=DEFAULT_EXCLUDES if use_default_excludes else None,
+        discovery=discovery,
+        ignore_files=ignore_files,
+        changed_since=changed_since,
+        staged=staged,
+    )
+    owns_executor = executor is None
+    if owns_executor:
+        # As for ``_map_files``, 0 jobs stands for the default number of workers.
+        executor = ThreadPoolExecutor(max_workers=jobs or None)
+
+    discovered = asyncio.Queue(maxsize=queue_size)
+    checked = asyncio.Queue(maxsize=queue_size)
+    results = asyncio.Queue(maxsize=queue_size)
+    tasks = [
+        loop.create_task(_discover(loop, executor, files, discovered)),
+        loop.create_task(
+            _check(loop, executor, file_type_mappings, settings, discovered, checked)
+        ),
+        loop.create_task(_write(loop, executor, settings, checked, results)),
+    ]
+    try:
+        while True:
+            item = await results.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _Failure):
+                raise item.error
+            file, pending_result = item
+            result = await pending_result
+            yield FileResult(file, result.exit_status, result.messages)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for queue in (checked, results):
+            _discard(queue)
+        if owns_executor:
+            executor.shutdown(wait=True)
+
+
+async def run(*args, output=None, **kwargs):
+    """Run the pipeline, print the messages of every file and return the exit status.
+
+    Takes the same arguments as ``iter_results``, and prints to ``output``, which
+    defaults to ``sys.stdout``.
+    """
+    output = output or sys.stdout
+    exit_status = 0
+    async for result in iter_results(*args, **kwargs):
+        exit_status = max(exit_status, result.exit_status)
+        for message in result.messages:
+            print(message, file=output)
+    return exit_status
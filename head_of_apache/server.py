@@ -0,0 +1,507 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""Long running server that keeps the header checks of a tree warm.
+
+A ``Server`` searches its paths once and remembers the outcome of every file it
+checks. A watcher then tells it which files changed since: ``InotifyWatcher``
+receives the changes from the kernel on Linux, and ``PollingWatcher`` compares the
+modification times of the files and directories elsewhere. Only the changed files
+are checked again, and the paths are only searched again when files or
+directories are added, removed or renamed, or when an ignore file changes.
+
+Requests are served over a Unix socket, one JSON object per line, by ``serve`` (see
+``head_of_apache.client`` for the other end). Changes are collected before a request
+is answered, so a file saved right before a request is always checked again.
+"""
+
+import ctypes
+import ctypes.util
+import json
+import os
+import selectors
+import socket
+import stat
+import struct
+import sys
+from pathlib import Path
+
+from .exclude import DEFAULT_EXCLUDES
+from .main import (
+    COMMENT_STYLES,
+    OUTCOME_ERROR,
+    OUTCOME_FIXED,
+    OUTCOME_OK,
+    Settings,
+    _can_report,
+    _current_year,
+    _map_files,
+    _merge_mapping,
+    _report,
+    _stat_key,
+    get_files,
+)
+
+DEFAULT_SOCKET = ".head_of_apache.sock"
+# Maximum size of a request, in bytes.
+MAX_REQUEST_SIZE = 1 << 24
+# Seconds that a connected client has to send its request.
+REQUEST_TIMEOUT = 10
+
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_WATCH_MASK = (
+    _IN_MODIFY
+    | _IN_ATTRIB
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+    | _IN_MOVE_SELF
+)
+# Events that add or remove entries from a directory.
+_STRUCTURE_EVENTS = _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+# struct inotify_event, without its trailing name.
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+
+def _walk_directories(roots, default_excludes):
+    """Yield ``roots`` and their subdirectories that are searched for files."""
+    for root in roots:
+        if not os.path.isdir(root):
+            continue
+        for directory, subdirectories, _ in os.walk(root):
+            subdirectories[:] = [
+                name
+                for name in subdirectories
+                if not name.startswith(".") and name not in default_excludes
+            ]
+            yield directory
+
+
+class InotifyWatcher:
+    """Watch directories with the Linux ``inotify`` API, through ``ctypes``."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self._directories = {}
+
+    @staticmethod
+    def available():
+        return sys.platform.startswith("linux") and bool(ctypes.util.find_library("c"))
+
+    def watch(self, directories):
+        """Watch ``directories`` instead of the previously watched ones."""
+        directories = set(directories)
+        for descriptor, directory in list(self._directories.items()):
+            if directory not in directories:
+                self._rm_watch(self.fd, descriptor)
+                del self._directories[descriptor]
+        self.add(directories)
+
+    def add(self, directories):
+        """Also watch ``directories``."""
+        watched = set(self._directories.values())
+        for directory in directories:
+            if directory in watched:
+                continue
+            descriptor = self._add_watch(self.fd, os.fsencode(directory), _WATCH_MASK)
+            if descriptor >= 0:
+                self._directories[descriptor] = directory
+
+    def track(self, files):
+        # Changes to files are reported by the directories that hold them.
+        pass
+
+    def poll(self):
+        """Return the changed paths and whether the paths must be searched again.
+
+        The changed paths are ``None`` if events were lost, and then every file must
+        be checked again.
+        """
+        changed, rescan = set(), False
+        while True:
+            try:
+                data = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                descriptor, mask, _, length = _INOTIFY_EVENT.unpack_from(data, offset)
+                offset += _INOTIFY_EVENT.size
+                name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+                offset += length
+                if mask & _IN_Q_OVERFLOW:
+                    return None, True
+                if mask & _IN_IGNORED:
+                    self._directories.pop(descriptor, None)
+                    continue
+                directory = self._directories.get(descriptor)
+                if directory is None:
+                    continue
+                if mask & (_IN_DELETE_SELF | _IN_MOVE_SELF) or (
+                    mask & _IN_ISDIR and mask & _STRUCTURE_EVENTS
+                ):
+                    rescan = True
+                elif name:
+                    changed.add(os.path.join(directory, name))
+        return changed, rescan
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Find changes by comparing the ``stat`` of directories and files.
+
+    Adding or removing entries changes the modification time of a directory, so
+    only the directories and the checked files are looked at, never their content.
+    """
+
+    fd = None
+
+    def __init__(self):
+        self._directories = {}
+        self._files = {}
+
+    @staticmethod
+    def _modification_time(directory):
+        try:
+            return os.stat(directory).st_mtime_ns
+        except OSError:
+            return None
+
+    def watch(self, directories):
+        self._directories = {}
+        self.add(directories)
+
+    def add(self, directories):
+        for directory in directories:
+            if directory not in self._directories:
+                self._directories[directory] = self._modification_time(directory)
+
+    def track(self, files):
+        """Look for changes in ``files`` instead of the previously tracked ones.
+
+        Files that were already tracked keep their previous ``stat`` result, so no
+        change is missed while the paths are searched again.
+        """
+        self._files = {
+            file: self._files[file] if file in self._files else _stat_key(file)
+            for file in files
+        }
+
+    def poll(self):
+        rescan = any(
+            self._modification_time(directory) != modification_time
+            for directory, modification_time in self._directories.items()
+        )
+        changed = set()
+        for file, key in self._files.items():
+            new_key = _stat_key(file)
+            if new_key != key:
+                changed.add(file)
+                self._files[file] = new_key
+        return changed, rescan
+
+    def close(self):
+        pass
+
+
+def make_watcher():
+    """Return an ``InotifyWatcher`` where available, or else a ``PollingWatcher``."""
+    if InotifyWatcher.available():
+        try:
+            return InotifyWatcher()
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher()
+
+
+def _remove_stale_socket(socket_path):
+    """Remove the socket left at ``socket_path`` by a server that did not stop cleanly.
+
+    Raises a ``FileExistsError`` if ``socket_path`` is not a socket, or if a server
+    still listens on it.
+    """
+    try:
+        mode = os.lstat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f"'{socket_path}' already exists and is not a socket.")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(os.fspath(socket_path))
+        except OSError:
+            os.remove(socket_path)
+            return
+    raise FileExistsError(f"A server is already listening on '{socket_path}'.")
+
+
+class Server:
+    """Warm index of the header check outcomes of the files in ``paths``.
+
+    The other arguments have the same meaning as for ``head_of_apache.main._main``,
+    except for ``dry_run``, which is given with every request.
+    """
+
+    def __init__(
+        self,
+        paths,
+        author,
+        mapping=None,
+        exclude=None,
+        last_year_present=False,
+        start_year_override=None,
+        use_default_excludes=True,
+        discovery="walk",
+        ignore_files=None,
+        minified="insert",
+        jobs=None,
+        watcher=None,
+    ):
+        self.paths = [Path(os.path.abspath(path)) for path in paths]
+        self.author = author
+        self.exclude = exclude
+        self.last_year_present = last_year_present
+        self.start_year_override = start_year_override
+        self.default_excludes = DEFAULT_EXCLUDES if use_default_excludes else None
+        self.discovery = discovery
+        self.ignore_files = frozenset(ignore_files or ())
+        self.minified = minified
+        self.jobs = jobs
+        self.file_type_mappings = _merge_mapping(mapping)
+        self.watcher = watcher if watcher is not None else make_watcher()
+        self._files = []
+        self._file_set = set()
+        self._outcomes = {}
+        self._changed = set()
+        self._rescan = True
+        self._year = None
+        self._running = False
+
+    def _get_files(self, paths):
+        return get_files(
+            paths,
+            self.exclude,
+            self.file_type_mappings,
+            default_excludes=self.default_excludes,
+            discovery=self.discovery,
+            ignore_files=self.ignore_files,
+        )
+
+    def _collect(self):
+        changed, rescan = self.watcher.poll()
+        if changed is None:
+            self._outcomes.clear()
+        else:
+            self._changed.update(changed)
+        self._rescan = self._rescan or rescan
+
+    def refresh(self):
+        """Forget the outcomes of changed files, and search the paths if needed."""
+        self._collect()
+        for path in self._changed:
+            self._outcomes.pop(path, None)
+            if os.path.basename(path) in self.ignore_files:
+                self._rescan = True
+            elif (path in self._file_set) != os.path.isfile(path):
+                # A file to check was added or removed.
+                self._rescan = self._rescan or (
+                    path in self._file_set
+                    or os.path.splitext(path)[1][1:] in self.file_type_mappings
+                )
+        self._changed = set()
+        year = _current_year()
+        if year != self._year:
+            self._outcomes.clear()
+            self._year = year
+        if not self._rescan:
+            return
+        # Watch before searching, so that no change can be missed in between.
+        self.watcher.watch(_walk_directories(self.paths, self.default_excludes or ()))
+        self._files = list(self._get_files(self.paths))
+        self._file_set = {os.fspath(file) for file in self._files}
+        # Files found through symlinked directories.
+        self.watcher.add({os.path.dirname(file) for file in self._file_set})
+        self.watcher.track(self._file_set)
+        self._outcomes = {
+            file: outcome
+            for file, outcome in self._outcomes.items()
+            if file in self._file_set
+        }
+        self._rescan = False
+
+    def _is_served(self, directory):
+        """Whether ``directory`` is one of the served directories, or inside of one."""
+        return any(
+            root.is_dir()
+            and (
+                directory == os.fspath(root)
+                or directory.startswith(os.path.join(root, ""))
+            )
+            for root in self.paths
+        )
+
+    def _select(self, paths):
+        if not paths:
+            return self._files
+        files = []
+        for path in paths:
+            path = os.path.abspath(path)
+            if os.path.isdir(path) and self._is_served(path):
+                prefix = os.path.join(path, "")
+                files.extend(
+                    file for file in self._files if os.fspath(file).startswith(prefix)
+                )
+            else:
+                # Files, and directories outside of the served ones, are searched.
+                files.extend(self._get_files([path]))
+        return files
+
+    def check(self, paths=None, dry_run=False):
+        """Check and fix the files in ``paths``, or all of them.
+
+        Returns the exit status and the messages of a ``head_of_apache`` run over
+        the same files.
+        """
+        self.refresh()
+        settings = Settings(
+            author=self.author,
+            current_year=self._year,
+            dry_run=dry_run,
+            last_year_present=self.last_year_present,
+            start_year_override=self.start_year_override,
+            minified=self.minified,
+        )
+        files = self._select(paths)
+
+        def items():
+            for file in files:
+                style = COMMENT_STYLES[self.file_type_mappings[file.suffix[1:]]]
+                outcome = self._outcomes.get(os.fspath(file))
+                result = None
+                if _can_report(outcome, settings):
+                    result = _report(file, outcome, settings)
+                yield (file, style, settings), result
+
+        exit_status = 0
+        messages = []
+        for file, result in zip(files, _map_files(items(), self.jobs)):
+            exit_status = max(exit_status, result.exit_status)
+            messages.extend(result.messages)
+            file = os.fspath(file)
+            # Only the outcomes of files in watched directories stay valid.
+            if file not in self._file_set or result.outcome == OUTCOME_ERROR:
+                continue
+            if result.outcome == OUTCOME_FIXED:
+                self._outcomes[file] = OUTCOME_OK
+            else:
+                self._outcomes[file] = result.outcome
+        return exit_status, messages
+
+    def handle(self, request):
+        """Answer a decoded request, and return the response to encode."""
+        command = request.get("command", "check")
+        if command == "check":
+            try:
+                exit_status, messages = self.check(
+                    request.get("paths"), bool(request.get("dry_run"))
+                )
+            except OSError as e:
+                # E.g. a file was removed while it was checked.
+                self._rescan = True
+                return {"error": str(e)}
+            return {"exit_status": exit_status, "messages": messages}
+        if command == "stop":
+            self._running = False
+            return {"exit_status": 0, "messages": []}
+        return {"error": f"Unknown command {command!r}."}
+
+    def _serve_connection(self, connection):
+        connection.settimeout(REQUEST_TIMEOUT)
+        with connection, connection.makefile("rb") as stream:
+            try:
+                line = stream.readline(MAX_REQUEST_SIZE)
+                if not line:
+                    # Closed without a request, e.g. by a check for a running server.
+                    return
+                response = self.handle(json.loads(line))
+            except (OSError, ValueError) as e:
+                response = {"error": str(e)}
+            try:
+                connection.sendall(json.dumps(response).encode() + b"\n")
+            except OSError:
+                pass
+
+    def serve(self, socket_path=DEFAULT_SOCKET, ready=None):
+        """Answer requests on the Unix socket at ``socket_path`` until stopped.
+
+        The files are searched and watched before the socket starts listening, and
+        ``ready`` is called once it does. Raises a ``FileExistsError`` if something
+        else than the socket of a stopped server is at ``socket_path``.
+        """
+        _remove_stale_socket(socket_path)
+        self.refresh()
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        selector = selectors.DefaultSelector()
+        bound = False
+        try:
+            listener.bind(os.fspath(socket_path))
+            bound = True
+            listener.listen()
+            selector.register(listener, selectors.EVENT_READ)
+            if self.watcher.fd is not None:
+                selector.register(self.watcher.fd, selectors.EVENT_READ)
+            if ready is not None:
+                ready()
+            self._running = True
+            while self._running:
+                for key, _ in selector.select():
+                    if key.fileobj is listener:
+                        connection, _ = listener.accept()
+                        self._serve_connection(connection)
+                    else:
+                        # Drain the events as they come, so the kernel queue does
+                        # not overflow between requests.
+                        self._collect()
+        finally:
+            selector.close()
+            listener.close()
+            self.watcher.close()
+            if bound:
+                try:
+                    os.remove(socket_path)
+                except OSError:
+                    pass
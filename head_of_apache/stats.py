@@ -0,0 +1,201 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""Timings and counters of a run, collected when ``--stats`` is given.
+
+Nothing in this module is used unless statistics are requested: the code that
+collects them is only reached behind ``stats is not None`` or ``timer is not None``
+checks, so a normal run does not pay for it.
+"""
+
+import heapq
+import json
+import os
+import threading
+import time
+
+# Phases of a run, in the order in which they are reported. Discovery runs in the
+# main process, the other phases are timed per file in the workers.
+PHASES = ("discovery", "read", "validate", "rewrite")
+COUNTERS = (
+    "scanned",
+    "cached",
+    "ok",
+    "missing",
+    "outdated",
+    "skipped",
+    "binary",
+    "inserted",
+    "updated",
+    "errors",
+    "bytes_read",
+    "bytes_written",
+)
+# Number of slowest files reported.
+SLOWEST_FILES = 10
+
+
+class FileTimer:
+    """Times the phases of the check of a single file.
+
+    ``lap`` charges the wall and CPU time elapsed since the previous lap to a phase.
+    The CPU time is the one of the current thread, so timers of files processed
+    concurrently by a thread pool do not include each other. Timers are small and
+    picklable, so they travel back from process pools with the ``Result`` of the file.
+    With ``spans``, every lap is also kept as a ``(phase, start, end)`` tuple, along
+    with the process and thread that did the work, for ``head_of_apache.trace``.
+    """
+
+    __slots__ = (
+        "phases",
+        "bytes_read",
+        "bytes_written",
+        "action",
+        "spans",
+        "pid",
+        "tid",
+        "_wall",
+        "_cpu",
+    )
+
+    def __init__(self, spans=False):
+        self.phases = {}
+        self.bytes_read = 0
+        self.bytes_written = 0
+        # "inserted" or "updated" once the header of the file has been written.
+        self.action = None
+        self.spans = None
+        self.pid = self.tid = None
+        if spans:
+            self.spans = []
+            self.pid = os.getpid()
+            self.tid = threading.get_ident()
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+
+    def lap(self, phase):
+        wall, cpu = time.perf_counter(), time.thread_time()
+        total_wall, total_cpu = self.phases.get(phase, (0.0, 0.0))
+        self.phases[phase] = (
+            total_wall + wall - self._wall,
+            total_cpu + cpu - self._cpu,
+        )
+        if self.spans is not None:
+            self.spans.append((phase, self._wall, wall))
+        self._wall, self._cpu = wall, cpu
+
+    @property
+    def wall_time(self):
+        return sum(wall for wall, _ in self.phases.values())
+
+
+class Stats:
+    """Aggregated timings and counters of a run.
+
+    Per file phases are summed over all the files, so with several jobs their wall
+    time can exceed the wall time of the whole run.
+    """
+
+    def __init__(self, slowest=SLOWEST_FILES):
+        self.phases = {phase: [0.0, 0.0] for phase in PHASES}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.slowest = slowest
+        self._slowest = []
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+        self.wall_time = self.cpu_time = 0.0
+
+    def add_time(self, phase, wall, cpu):
+        total = self.phases[phase]
+        total[0] += wall
+        total[1] += cpu
+
+    def count(self, counter, n=1):
+        self.counters[counter] += n
+
+    def timed(self, iterable, phase):
+        """Yield from ``iterable``, charging the time spent in it to ``phase``."""
+        iterator = iter(iterable)
+        while True:
+            wall, cpu = time.perf_counter(), time.thread_time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.add_time(
+                    phase,
+                    time.perf_counter() - wall,
+                    time.thread_time() - cpu,
+                )
+            yield item
+
+    def add_file(self, file, timer):
+        """Merge the ``FileTimer`` of ``file`` into the totals."""
+        for phase, (wall, cpu) in timer.phases.items():
+            self.add_time(phase, wall, cpu)
+        self.counters["bytes_read"] += timer.bytes_read
+        self.counters["bytes_written"] += timer.bytes_written
+        if timer.action is not None:
+            self.counters[timer.action] += 1
+        entry = (timer.wall_time, os.fspath(file))
+        if len(self._slowest) < self.slowest:
+            heapq.heappush(self._slowest, entry)
+        elif self._slowest and entry > self._slowest[0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def stop(self):
+        """Record the total wall and CPU time of the run so far."""
+        self.wall_time = time.perf_counter() - self._start_wall
+        self.cpu_time = time.process_time() - self._start_cpu
+
+    def slowest_files(self):
+        """Return the ``(wall_time, file)`` of the slowest files, slowest first."""
+        return sorted(self._slowest, reverse=True)
+
+    def as_dict(self):
+        return {
+            "wall_time": self.wall_time,
+            "cpu_time": self.cpu_time,
+            "phases": {
+                phase: {"wall_time": wall, "cpu_time": cpu}
+                for phase, (wall, cpu) in self.phases.items()
+            },
+            "counters": dict(self.counters),
+            "slowest_files": [
+                {"file": file, "wall_time": wall} for wall, file in self.slowest_files()
+            ],
+        }
+
+    def dump(self, f):
+        json.dump(self.as_dict(), f, indent=2)
+        f.write("\n")
+
+    def format(self):
+        """Return a human readable report of the statistics."""
+        lines = [
+            f"Total: {self.wall_time:.3f}s wall, {self.cpu_time:.3f}s CPU "
+            "(main process)",
+            f"{'Phase':<12}{'Wall (s)':>12}{'CPU (s)':>12}",
+        ]
+        for phase, (wall, cpu) in self.phases.items():
+            lines.append(f"{phase:<12}{wall:>12.3f}{cpu:>12.3f}")
+        lines.append("Counters:")
+        for counter, value in self.counters.items():
+            lines.append(f"  {counter}: {value}")
+        slowest = self.slowest_files()
+        if slowest:
+            lines.append("Slowest files:")
+            for wall, file in slowest:
+                lines.append(f"  {wall * 1000:10.3f} ms  {file}")
+        return "\n".join(lines)
@@ -0,0 +1,168 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""Spans of the work done in a run, and their export as a Chrome trace.
+
+Any callable can ``subscribe`` to the ``Span`` objects of a run: one span for every
+directory listed while walking, one for every file checked, and one for each of
+the phases of a file (``read``, ``validate`` and ``rewrite``, see
+``head_of_apache.stats.PHASES``). Spans are only built while there are
+subscribers, and ``head_of_apache.main._main`` looks at ``enabled`` once per run,
+so subscribing in the middle of a run has no effect on it.
+
+Files are checked in worker threads or processes, so their spans are recorded by
+the ``FileTimer`` of the file and published by the main process once its result
+is back. ``start`` and ``end`` are ``time.perf_counter`` values, which are
+comparable between the processes of a single machine, and ``pid`` and ``tid``
+identify the worker that did the work.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+Span = namedtuple("Span", ["name", "category", "start", "end", "pid", "tid", "args"])
+
+_subscribers = []
+
+
+def subscribe(callback):
+    """Call ``callback`` with every ``Span`` published from now on."""
+    _subscribers.append(callback)
+
+
+def unsubscribe(callback):
+    _subscribers.remove(callback)
+
+
+def enabled():
+    """Whether anyone is subscribed to the spans."""
+    return bool(_subscribers)
+
+
+def publish(span):
+    for callback in list(_subscribers):
+        callback(span)
+
+
+def publish_span(name, category, start, end=None, **args):
+    """Publish a span of the current thread, that ends now if ``end`` is ``None``."""
+    if end is None:
+        end = time.perf_counter()
+    publish(Span(name, category, start, end, os.getpid(), threading.get_ident(), args))
+
+
+@contextmanager
+def span(name, category, **args):
+    """Publish a span covering the body of the ``with`` statement.
+
+    Meant for code that runs once per run or per directory. In per file code, check
+    ``enabled`` and call ``publish_span`` instead.
+    """
+    if not _subscribers:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        publish_span(name, category, start, **args)
+
+
+def publish_file(file, timer, outcome):
+    """Publish the spans recorded by the ``FileTimer`` of a checked file."""
+    if not timer.spans:
+        return
+    args = {"file": os.fspath(file), "outcome": outcome}
+    if timer.bytes_read:
+        args["bytes_read"] = timer.bytes_read
+    if timer.bytes_written:
+        args["bytes_written"] = timer.bytes_written
+    start, end = timer.spans[0][1], timer.spans[-1][2]
+    publish(Span("check", "file", start, end, timer.pid, timer.tid, args))
+    for phase, phase_start, phase_end in timer.spans:
+        publish(Span(phase, "file", phase_start, phase_end, timer.pid, timer.tid, {}))
+
+
+class ChromeTraceWriter:
+    """Subscriber that streams spans to a Chrome trace event file.
+
+    The file holds a JSON array of complete ("X") events, which can be opened with
+    ``chrome://tracing``, https://ui.perfetto.dev or ``speedscope``. Events are
+    written as they are published, so memory use does not grow with the number of
+    files. Timestamps are in microseconds since the writer was created, and every
+    worker gets a named track, besides the "main" track of the discovery.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, "w")
+        self._file.write("[\n")
+        self._origin = time.perf_counter()
+        self._separator = ""
+        self._threads = set()
+        self._lock = threading.Lock()
+
+    def _write(self, event):
+        self._file.write(self._separator + json.dumps(event))
+        self._separator = ",\n"
+
+    def __call__(self, span):
+        with self._lock:
+            if self._file is None:
+                return
+            track = (span.pid, span.tid)
+            if track not in self._threads:
+                if track == (os.getpid(), threading.main_thread().ident):
+                    name = "main"
+                else:
+                    name = f"worker {len(self._threads)}"
+                self._threads.add(track)
+                self._write(
+                    {
+                        "name": "thread_name",
+                        "ph": "M",
+                        "pid": span.pid,
+                        "tid": span.tid,
+                        "args": {"name": name},
+                    }
+                )
+            self._write(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": (span.start - self._origin) * 1e6,
+                    "dur": (span.end - span.start) * 1e6,
+                    "pid": span.pid,
+                    "tid": span.tid,
+                    "args": span.args,
+                }
+            )
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.write("\n]\n")
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        subscribe(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        unsubscribe(self)
+        self.close()
@@ -0,0 +1,43 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import pathlib
+import tempfile
+
+import pytest
+
+from head_of_apache.main import COMMENT_STYLES
+
+from . import utils
+from .utils import bad_fnames, good_fnames
+
+
+@pytest.fixture()
+def workspace(request):
+    """A temporary directory with the good files of ``tests.utils`` in ``src`` and the
+    bad ones in ``src/sub``.
+
+    The files are written once per ``(extension, comment style)`` pair, only as
+    ``.py`` files with the hash comment style by default. Other pairs are given by
+    parametrizing the fixture indirectly with a list of pairs.
+    """
+    styles = getattr(request, "param", [("py", "hash")])
+    with tempfile.TemporaryDirectory() as tempdir:
+        tempdir = pathlib.Path(tempdir)
+        (tempdir / "src" / "sub").mkdir(parents=True)
+        for extension, style in styles:
+            for directory, fnames in [("src", good_fnames), ("src/sub", bad_fnames)]:
+                for fname in fnames:
+                    with open(tempdir / directory / f"{fname}.{extension}", "w") as f:
+                        f.write(getattr(utils, fname)(**COMMENT_STYLES[style]))
+        yield tempdir
@@ -0,0 +1,131 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import io
+import os
+import pathlib
+import tarfile
+import tempfile
+import zipfile
+
+import pytest
+
+from head_of_apache.archive import ArchiveError, check_archives
+from head_of_apache.main import COMMENT_STYLES, HEADER_READ_BUDGET, _main, main
+
+from . import utils
+from .utils import GOOD_AUTHOR, bad_fnames, good_fnames
+
+MEMBERS = {
+    **{
+        f"pkg-1.0/src/{fname}.py": getattr(utils, fname)(**COMMENT_STYLES["hash"])
+        for fname in good_fnames + bad_fnames
+    },
+    # Only the start of a member is read.
+    "pkg-1.0/src/large.py": utils.good_file_current_year(**COMMENT_STYLES["hash"])
+    + "#" * (4 * HEADER_READ_BUDGET),
+    "pkg-1.0/PKG-INFO": "Not checked\n",
+    "pkg-1.0/.hidden/a.py": "print('hidden')\n",
+    "pkg-1.0/node_modules/lib.js": "var lib;\n",
+    "pkg-1.0/tests/test_a.py": "print('test')\n",
+}
+
+
+def write_tar(path, mode):
+    with tarfile.open(path, mode) as tar:
+        for name, content in MEMBERS.items():
+            data = content.encode()
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+def write_zip(path):
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr("pkg-1.0/src/", "")
+        for name, content in MEMBERS.items():
+            zip_file.writestr(name, content)
+
+
+@pytest.fixture(
+    params=[
+        ("pkg-1.0.tar.gz", "w:gz"),
+        ("pkg-1.0.tar.xz", "w:xz"),
+        ("pkg-1.0.tar", "w"),
+        ("pkg-1.0.zip", None),
+        ("pkg-1.0-py3-none-any.whl", None),
+    ]
+)
+def archive(request):
+    name, mode = request.param
+    with tempfile.TemporaryDirectory() as tempdir:
+        path = pathlib.Path(tempdir) / name
+        if mode is None:
+            write_zip(path)
+        else:
+            write_tar(path, mode)
+        yield path
+
+
+def expected_messages(archive, exclude, capsys):
+    """The messages of a dry run over the extracted members of ``archive``."""
+    with tempfile.TemporaryDirectory() as tempdir:
+        for name, content in MEMBERS.items():
+            path = pathlib.Path(tempdir, name)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "w") as f:
+                f.write(content)
+        _main([pathlib.Path(tempdir)], GOOD_AUTHOR, None, exclude, True, False, jobs=1)
+        output = capsys.readouterr().out
+        return output.replace(f"'{tempdir}{os.sep}", f"'{archive}:").splitlines()
+
+
+def test_check_archives(archive, capsys):
+    exclude = [pathlib.Path("test_*.py")]
+    expected = expected_messages(archive, exclude, capsys)
+    assert check_archives([archive], GOOD_AUTHOR, exclude=exclude) == 1
+    assert sorted(capsys.readouterr().out.splitlines()) == sorted(expected)
+    assert (
+        f"No license header found in '{archive}:pkg-1.0/src/bad_file_no_header.py'."
+        in expected
+    )
+    # Nothing is extracted.
+    assert os.listdir(archive.parent) == [archive.name]
+
+    assert (
+        check_archives([archive], GOOD_AUTHOR, exclude=[pathlib.Path("pkg-1.0")]) == 0
+    )
+    assert check_archives([archive], GOOD_AUTHOR, exclude=["*.py"]) == 0
+    assert capsys.readouterr().out == ""
+
+
+def test_check_archives_cli(archive, capsys):
+    assert main(["-a", GOOD_AUTHOR, "--archives", str(archive)]) == 1
+    messages = capsys.readouterr().out.splitlines()
+    assert f"No license header found in '{archive}:pkg-1.0/tests/test_a.py'." in (
+        messages
+    )
+    with pytest.raises(SystemExit):
+        main(["-a", GOOD_AUTHOR, "--archives", "--pipeline", str(archive)])
+
+
+def test_check_archives_errors(capsys):
+    with tempfile.TemporaryDirectory() as tempdir:
+        path = pathlib.Path(tempdir) / "broken.tar.gz"
+        with open(path, "wb") as f:
+            f.write(b"not an archive")
+        with pytest.raises(ArchiveError, match="Cannot read the archive"):
+            check_archives([path], GOOD_AUTHOR)
+        with pytest.raises(SystemExit):
+            main(["-a", GOOD_AUTHOR, "--archives", str(path)])
+    assert "Cannot read the archive" in capsys.readouterr().err
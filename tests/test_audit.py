@@ -0,0 +1,134 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import os
+import pathlib
+import subprocess
+import tempfile
+from unittest.mock import patch
+
+import pytest
+
+from head_of_apache import git
+from head_of_apache.audit import audit
+from head_of_apache.git import GitError
+from head_of_apache.main import COMMENT_STYLES, main
+
+from .utils import GOOD_AUTHOR, render_file_contents
+
+
+def header_file(year):
+    return render_file_contents(
+        year, GOOD_AUTHOR, has_license=True, **COMMENT_STYLES["hash"]
+    )
+
+
+@pytest.fixture()
+def repository():
+    """A repository with the tags v1 (2020), v2 (2021) and v3 (2021)."""
+    with tempfile.TemporaryDirectory() as tempdir:
+        root = pathlib.Path(tempdir)
+
+        def commit(year, tag, files):
+            for name, content in files.items():
+                (root / name).parent.mkdir(parents=True, exist_ok=True)
+                with open(root / name, "w") as f:
+                    f.write(content)
+            env = dict(
+                os.environ,
+                GIT_AUTHOR_DATE=f"{year}-06-01T12:00:00Z",
+                GIT_COMMITTER_DATE=f"{year}-06-01T12:00:00Z",
+            )
+            for args in [
+                ["add", "."],
+                ["commit", "-q", "-m", tag],
+                ["tag", tag],
+            ]:
+                subprocess.run(
+                    ["git", "-C", str(root), "-c", "user.name=a", "-c", "user.email=a"]
+                    + args,
+                    check=True,
+                    env=env,
+                    stdout=subprocess.DEVNULL,
+                )
+
+        try:
+            subprocess.run(["git", "init", "-q", str(root)], check=True)
+            commit(
+                2020,
+                "v1",
+                {
+                    "a.py": header_file("2020 - 2020"),
+                    "b.py": "print('b')\n",
+                    "notes.txt": "Not checked\n",
+                    ".hidden.py": "print('hidden')\n",
+                    "node_modules/lib.js": "var lib;\n",
+                },
+            )
+            commit(2021, "v2", {"c.py": header_file("2021 - 2021")})
+            commit(2021, "v3", {"c.py": header_file("2021 - 2021") + "\n"})
+        except (OSError, subprocess.CalledProcessError):
+            pytest.skip("git is not available")
+        # The working tree is never read.
+        os.remove(root / "a.py")
+        with open(root / "b.py", "w") as f:
+            f.write(header_file("2020 - 2021"))
+        yield root
+
+
+def test_audit(repository, capsys):
+    a, b, c = (os.path.join(repository, name) for name in ["a.py", "b.py", "c.py"])
+    readers = []
+    read_prefix = git.BlobReader.read_prefix
+
+    def record_read(self, object_name, size):
+        readers.append((self, object_name))
+        return read_prefix(self, object_name, size)
+
+    with patch.object(git.BlobReader, "read_prefix", record_read):
+        assert audit([repository], ["v1", "v2", "v3"], GOOD_AUTHOR) == 1
+    assert capsys.readouterr().out.splitlines() == [
+        f"No license header found in 'v1:{b}'.",
+        f"Must update existing license header found in 'v2:{a}'.",
+        f"No license header found in 'v2:{b}'.",
+        f"Must update existing license header found in 'v3:{a}'.",
+        f"No license header found in 'v3:{b}'.",
+    ]
+    # A single process reads every blob, and the same content is only read once
+    # per year.
+    assert len({reader for reader, _ in readers}) == 1
+    assert len(readers) == 6
+    assert len({object_name for _, object_name in readers}) == 4
+
+    assert audit([c], ["v3"], GOOD_AUTHOR) == 0
+    assert audit([repository], ["v1"], GOOD_AUTHOR, exclude=[pathlib.Path(b)]) == 0
+    assert capsys.readouterr().out == ""
+
+
+def test_audit_errors(repository):
+    with pytest.raises(GitError):
+        audit([repository], ["unknown"], GOOD_AUTHOR)
+    with tempfile.TemporaryDirectory() as tempdir:
+        with pytest.raises(GitError):
+            audit([tempdir], ["v1"], GOOD_AUTHOR)
+
+
+def test_audit_cli(repository, capsys):
+    args = ["-a", GOOD_AUTHOR, str(repository)]
+    assert main(["--audit", "v1", *args]) == 1
+    assert capsys.readouterr().out.splitlines() == [
+        f"No license header found in 'v1:{os.path.join(repository, 'b.py')}'."
+    ]
+    for other in [["--pipeline"], ["--staged"], ["--stats"], ["--audit", "unknown"]]:
+        with pytest.raises(SystemExit):
+            main(["--audit", "v1", *other, *args])
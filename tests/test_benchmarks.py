@@ -0,0 +1,76 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import os
+import tempfile
+
+from benchmarks.run import compare, run_phase
+from benchmarks.synthetic_tree import generate_tree
+from head_of_apache.main import get_files
+
+
+def list_tree(root):
+    tree = {}
+    for directory, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(directory, name)
+            with open(path, "rb") as f:
+                tree[os.path.relpath(path, root)] = f.read()
+    return tree
+
+
+def test_generate_tree():
+    with tempfile.TemporaryDirectory() as tempdir:
+        trees = []
+        for name in ["a", "b"]:
+            root = os.path.join(tempdir, name)
+            n_checked = generate_tree(
+                root,
+                300,
+                seed=1,
+                files_per_directory=10,
+                deep_every=7,
+                large_ratio=0.05,
+            )
+            trees.append(list_tree(root))
+        assert trees[0] == trees[1]
+        assert len(trees[0]) == 300
+        assert sum(1 for _ in get_files([root])) == n_checked
+        assert any("deep" in path for path in trees[0])
+
+        result = run_phase("check", root, jobs=1)
+        assert result["seconds"] > 0
+        assert list_tree(root) == trees[1]
+        run_phase("rewrite", root, jobs=1)
+        assert list_tree(root) != trees[1]
+
+
+def test_compare():
+    baseline = {
+        "phases": {
+            "check": {"files_per_second": 1000, "peak_rss_bytes": 100},
+            "rewrite": {"files_per_second": 1000, "read_bytes": None},
+        }
+    }
+    results = {
+        "phases": {
+            "check": {"files_per_second": 850, "peak_rss_bytes": 130},
+            "rewrite": {"files_per_second": 700, "read_bytes": 10},
+            "discovery": {"files_per_second": 1},
+        }
+    }
+    assert compare(results, baseline, 0.2) == [
+        ("check", "peak_rss_bytes", 130, 100),
+        ("rewrite", "files_per_second", 700, 1000),
+    ]
+    assert compare(results, baseline, 0.5) == []
@@ -0,0 +1,172 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import os
+import pathlib
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+from unittest.mock import patch
+
+import pytest
+
+from head_of_apache import cache
+from head_of_apache.cache import CACHE_FILE, ResultCache, fingerprint, stat_key
+from head_of_apache.main import _check_file, _main, main
+
+from .utils import GOOD_AUTHOR, bad_fnames, good_fnames
+
+
+@pytest.fixture(autouse=True)
+def no_racy_window():
+    with patch.object(cache, "RACY_WINDOW_NS", 0):
+        yield
+
+
+def run(workspace, dry_run=True, author=GOOD_AUTHOR, **kwargs):
+    kwargs.setdefault("cache_dir", workspace / "cache")
+    return _main(
+        [workspace / "src"],
+        author=author,
+        mapping=None,
+        exclude=None,
+        dry_run=dry_run,
+        last_year_present=False,
+        jobs=1,
+        **kwargs,
+    )
+
+
+def count_checks():
+    return patch("head_of_apache.main._check_file", side_effect=_check_file)
+
+
+def test_cache_hits_skip_checks(workspace, capsys):
+    first_status = run(workspace)
+    first_output = capsys.readouterr().out
+    with count_checks() as check:
+        second_status = run(workspace)
+    assert check.call_count == 0
+    assert second_status == first_status
+    assert capsys.readouterr().out == first_output
+    with open(workspace / "cache" / ".gitignore") as f:
+        assert f.read().splitlines()[-1] == "*"
+
+
+def test_cache_pipeline(workspace, capsys, monkeypatch):
+    src = str(workspace / "src")
+    for args in [
+        ["--cache-dir", str(workspace / "cache")],
+        ["--shared-cache", str(workspace / "shared")],
+        ["--shared-cache-read-only"],
+    ]:
+        with pytest.raises(SystemExit):
+            main(["-a", GOOD_AUTHOR, "--dry-run", "--pipeline", *args, src])
+    assert "cannot be used with --pipeline" in capsys.readouterr().err
+    with pytest.raises(ValueError):
+        run(workspace, pipeline=True)
+    # The default cache is not used by the pipeline.
+    monkeypatch.chdir(workspace)
+    assert main(["-a", GOOD_AUTHOR, "--dry-run", "--pipeline", src]) == 1
+    assert os.listdir(workspace) == ["src"]
+
+
+def test_cache_after_fix(workspace, capsys):
+    assert run(workspace, dry_run=False) == 1
+    capsys.readouterr()
+    with count_checks() as check:
+        assert run(workspace, dry_run=False) == 0
+    assert check.call_count == 0
+    assert capsys.readouterr().out == ""
+
+
+def test_cache_invalidation(workspace, capsys):
+    run(workspace)
+    # A modified file is checked again.
+    changed = workspace / "src" / f"{good_fnames[0]}.py"
+    with open(changed, "a") as f:
+        f.write("\n")
+    with count_checks() as check:
+        run(workspace)
+    assert [call.args[0] for call in check.call_args_list] == [changed]
+
+    # Other options invalidate every entry.
+    with count_checks() as check:
+        run(workspace, author="Someone else")
+    assert check.call_count == len(good_fnames + bad_fnames)
+
+
+def test_cache_stat_key_and_sweep(workspace):
+    path = workspace / "src" / f"{good_fnames[0]}.py"
+    key = stat_key(os.stat(path))
+    with ResultCache(workspace / "cache", fingerprint(option=1)) as result_cache:
+        result_cache.put(path, key, 0)
+    with ResultCache(workspace / "cache", fingerprint(option=1)) as result_cache:
+        assert result_cache.get(path, key) == 0
+        assert result_cache.get(path, (key[0] + 1, *key[1:])) is None
+    with ResultCache(workspace / "cache", fingerprint(option=2)) as result_cache:
+        assert result_cache.get(path, key) is None
+
+    os.remove(path)
+    with ResultCache(workspace / "cache", fingerprint(option=1)) as result_cache:
+        result_cache.sweep()
+        with sqlite3.connect(workspace / "cache" / CACHE_FILE) as connection:
+            (count,) = connection.execute("SELECT COUNT(*) FROM results").fetchone()
+    assert count == 0
+
+
+def test_cache_corrupted(workspace, capsys):
+    (workspace / "cache").mkdir()
+    with open(workspace / "cache" / CACHE_FILE, "w") as f:
+        f.write("not a database")
+    first_status = run(workspace)
+    first_output = capsys.readouterr().out
+    with count_checks() as check:
+        assert run(workspace) == first_status
+    assert check.call_count == len(good_fnames + bad_fnames)
+    assert capsys.readouterr().out == first_output
+
+
+def test_shared_cache(workspace, capsys):
+    try:
+        subprocess.run(["git", "init", "-q", str(workspace / "src")], check=True)
+        subprocess.run(["git", "-C", str(workspace / "src"), "add", "."], check=True)
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip("git is not available")
+    with tempfile.TemporaryDirectory() as shared_cache_dir:
+        first_status = run(workspace, cache_dir=None, shared_cache_dir=shared_cache_dir)
+        first_output = capsys.readouterr().out
+
+        # Another clone of the same content only checks the files it changed.
+        with tempfile.TemporaryDirectory() as tempdir:
+            clone = pathlib.Path(tempdir)
+            shutil.copytree(workspace / "src", clone / "src")
+            changed = clone / "src" / f"{good_fnames[0]}.py"
+            with open(changed, "a") as f:
+                f.write("\n")
+            with count_checks() as check:
+                status = run(
+                    clone,
+                    cache_dir=None,
+                    shared_cache_dir=shared_cache_dir,
+                    shared_cache_read_only=True,
+                )
+            assert [call.args[0] for call in check.call_args_list] == [changed]
+            assert status == first_status
+            assert capsys.readouterr().out == first_output.replace(
+                str(workspace), str(clone)
+            )
+        # Read only runs do not add entries.
+        n_entries = sum(len(files) for _, _, files in os.walk(shared_cache_dir))
+        assert n_entries == len(good_fnames + bad_fnames)
@@ -0,0 +1,142 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import os
+import shutil
+
+import pytest
+
+from head_of_apache.engine import HeaderEngine
+from head_of_apache.main import (
+    COMMENT_STYLES,
+    LICENSE_LENGTH,
+    OUTCOME_BINARY,
+    OUTCOME_FIXED,
+    OUTCOME_MISSING,
+    OUTCOME_OK,
+    _main,
+    get_license_header,
+)
+
+from .utils import CURRENT_YEAR, GOOD_AUTHOR
+
+# Files of two comment styles.
+with_styles = pytest.mark.parametrize(
+    "workspace", [[("py", "hash"), ("js", "asterisk")]], indirect=True
+)
+
+
+def source_files(workspace):
+    return sorted((workspace / "src").rglob("*.*"))
+
+
+@with_styles
+def test_engine_matches_main(workspace, capsys):
+    engine = HeaderEngine(GOOD_AUTHOR)
+    src, copy = workspace / "src", workspace / "copy"
+    shutil.copytree(src, copy)
+    _main([copy], GOOD_AUTHOR, None, None, False, False, jobs=1)
+    expected_messages = capsys.readouterr().out.replace(str(copy), str(src))
+
+    messages = []
+    for path in source_files(workspace):
+        result = engine.check(path)
+        assert (result.outcome == OUTCOME_OK) == (result.exit_status == 0)
+        fixed = engine.fix(path)
+        assert fixed.exit_status == result.exit_status
+        messages.extend(fixed.messages)
+        assert engine.check(path).outcome == OUTCOME_OK
+        with open(path) as f, open(copy / path.relative_to(src)) as g:
+            assert f.read() == g.read()
+    assert sorted(messages) == sorted(expected_messages.splitlines())
+
+
+def test_engine_check_does_not_write(workspace):
+    path = workspace / "src" / "sub" / "bad_file_no_header.py"
+    with open(path) as f:
+        content = f.read()
+    result = HeaderEngine(GOOD_AUTHOR).check(path)
+    assert result.outcome == OUTCOME_MISSING
+    assert result.messages == [f"No license header found in '{path}'."]
+    with open(path) as f:
+        assert f.read() == content
+    assert HeaderEngine(GOOD_AUTHOR).fix(path).outcome == OUTCOME_FIXED
+
+
+def test_engine_header():
+    engine = HeaderEngine(GOOD_AUTHOR, mapping={"txt": "hash"}, current_year=2030)
+    assert engine.current_year == "2030"
+    header = engine.header("hash", 2024)
+    assert header is engine.header("hash", 2024)
+    assert header.text == get_license_header(
+        GOOD_AUTHOR, "2024 - 2030", **COMMENT_STYLES["hash"]
+    )
+    assert header.data == (header.text + "\n").replace("\n", os.linesep).encode()
+    assert header.n_lines == LICENSE_LENGTH
+    assert engine.header("hash").text.splitlines()[0] == (
+        f"#   Copyright 2030 - 2030 {GOOD_AUTHOR}"
+    )
+    present = HeaderEngine(GOOD_AUTHOR, last_year_present=True)
+    assert f"{CURRENT_YEAR} - present" in present.header("asterisk").text
+
+    assert engine.comment_style("notes.txt") == COMMENT_STYLES["hash"]
+    with pytest.raises(ValueError, match="No comment style"):
+        engine.comment_style("image.png")
+
+
+@with_styles
+def test_engine_buffers(workspace):
+    engine = HeaderEngine(GOOD_AUTHOR)
+    paths = source_files(workspace)
+    contents = []
+    for path in paths:
+        with open(path, "rb") as f:
+            contents.append(f.read())
+
+    items = [
+        (content, path.suffix, str(path)) for path, content in zip(paths, contents)
+    ]
+    assert engine.check_buffers(items) == [engine.check(path) for path in paths]
+    fixed = engine.fix_buffers(items)
+    for path, content, (fixed_content, result) in zip(paths, contents, fixed):
+        assert result == engine.fix(path)
+        with open(path, "rb") as f:
+            assert fixed_content == f.read()
+        if result.outcome != OUTCOME_FIXED:
+            assert fixed_content is content
+        # Text is fixed like bytes, with the lines of the header ending in "\n".
+        text = content.decode().replace(os.linesep, "\n")
+        fixed_text, text_result = engine.fix_buffer(text, path.suffix[1:], str(path))
+        assert text_result.messages == result.messages
+        assert fixed_text == fixed_content.decode().replace(os.linesep, "\n")
+        assert engine.check_buffer(fixed_text, path.suffix).exit_status == 0
+
+
+def test_engine_buffer_messages():
+    engine = HeaderEngine(GOOD_AUTHOR)
+    result = engine.check_buffer(b"print('hello')\n", ".py")
+    assert result.outcome == OUTCOME_MISSING
+    assert result.messages == ["No license header found in '<buffer>'."]
+    fixed, result = engine.fix_buffer("#!/usr/bin/env python\nprint('hello')\n", "py")
+    assert result.messages == ["Applied license header to '<buffer>'."]
+    assert fixed == (
+        "#!/usr/bin/env python\n" + engine.header("hash").text + "\nprint('hello')\n"
+    )
+    crlf = "#!/usr/bin/env python\r\nprint('hello')\r\n"
+    fixed_crlf, _ = engine.fix_buffer(crlf, "py")
+    assert fixed_crlf == fixed.replace("\n", "\r\n")
+    assert engine.check_buffer(fixed_crlf.encode(), "py").exit_status == 0
+    binary = b"\x00\x01\x02"
+    assert engine.fix_buffer(binary, "py") == (binary, (0, [], OUTCOME_BINARY, None))
+    with pytest.raises(ValueError, match="No comment style"):
+        engine.check_buffer(b"", "png")
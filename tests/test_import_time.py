@@ -0,0 +1,75 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import json
+import subprocess
+import sys
+
+# Modules that must only be imported when they are needed: to parse the command
+# line, to rewrite files, to run several jobs, to run git or to use a cache.
+LAZY_MODULES = [
+    "argparse",
+    "concurrent.futures",
+    "multiprocessing",
+    "shutil",
+    "sqlite3",
+    "subprocess",
+    "tempfile",
+    "head_of_apache.cache",
+    "head_of_apache.stats",
+]
+# Budget of ``python -X importtime`` for the cumulative import of
+# ``head_of_apache.main``, in microseconds. It is generous, to leave room for slow
+# machines and for a missing bytecode cache.
+IMPORT_TIME_BUDGET_US = 150_000
+
+
+def run_python(*args):
+    return subprocess.run(
+        [sys.executable, *args], capture_output=True, text=True, check=True
+    )
+
+
+def test_lazy_imports():
+    code = (
+        "import json, sys; before = set(sys.modules); import head_of_apache.main; "
+        "print(json.dumps(sorted(set(sys.modules) - before)))"
+    )
+    imported = json.loads(run_python("-c", code).stdout)
+    for module in LAZY_MODULES:
+        assert not [
+            name for name in imported if name == module or name.startswith(f"{module}.")
+        ]
+
+
+def test_import_time():
+    # The best of a few runs, to smooth over a busy machine.
+    times = []
+    for _ in range(3):
+        output = run_python("-X", "importtime", "-c", "import head_of_apache.main")
+        for line in output.stderr.splitlines():
+            _, cumulative, name = (part.strip() for part in line.split("|"))
+            if name == "head_of_apache.main":
+                times.append(int(cumulative))
+    assert len(times) == 3
+    assert min(times) < IMPORT_TIME_BUDGET_US
+
+
+def test_parser_is_built_on_demand():
+    code = (
+        "import sys, head_of_apache.main as main; "
+        "assert 'argparse' not in sys.modules; "
+        "assert main.parser is main.parser; "
+        "assert main.parser.prog == 'head_of_apache'"
+    )
+    run_python("-c", code)
@@ -11,26 +11,40 @@
 #   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
+import io
 import os
 import pathlib
 import re
+import shutil
+import subprocess
 import tempfile
+import tracemalloc
 from unittest.mock import patch
 
 import pytest
 
+import head_of_apache.main
+from head_of_apache.cache import DEFAULT_CACHE_DIR
+from head_of_apache.git import GitError
 from head_of_apache.main import (
     COMMENT_STYLES,
+    DEFAULT_EXCLUDES,
     DESIRED_LICENSE_NOTICE,
     FILE_TYPE_MAPPING,
     LICENSE_LENGTH,
+    MAX_LINE_LENGTH,
+    MINIFIED_POLICIES,
+    SINGLE_DATE_LICENSE_NOTICE,
     _main,
     get_files,
     get_license_header,
+    looks_binary,
+    looks_minified,
     main,
     parse_license_years,
     read_file_header_lines,
     validate_file_header,
+    validate_headers,
 )
 
 from . import utils
@@ -129,6 +143,301 @@ def test_get_files(file_extension, file_structure, exclude):
     assert set(files) == set(expected)
 
 
+def test_get_files_symlinks(file_extension, file_structure):
+    try:
+        os.symlink(file_structure, file_structure / "loop", target_is_directory=True)
+        os.symlink(
+            file_structure / f"{good_fnames[0]}.{file_extension}",
+            file_structure / f"link.{file_extension}",
+        )
+    except (OSError, NotImplementedError):
+        pytest.skip("Symlinks are not supported on this platform")
+    files = list(get_files([file_structure, file_structure / "bad_files"]))
+    expected = [file_structure / f"{fname}.{file_extension}" for fname in good_fnames]
+    expected.extend(
+        [
+            file_structure / "bad_files" / f"{fname}.{file_extension}"
+            for fname in bad_fnames
+        ]
+    )
+    assert len(files) == len(expected)
+    assert set(files) == set(expected)
+
+
+def test_get_files_nested_files(file_extension, file_structure):
+    hidden = file_structure / ".hidden" / f"a.{file_extension}"
+    vendored = file_structure / "node_modules" / f"b.{file_extension}"
+    for path in [hidden, vendored]:
+        path.parent.mkdir()
+        path.touch()
+    good_file = file_structure / f"{good_fnames[0]}.{file_extension}"
+    expected = set(get_files([file_structure])) | {hidden, vendored}
+    # Given files are checked even if the search of the directory skips them, and
+    # only once if it does not.
+    for paths in [
+        [file_structure, hidden, vendored, good_file],
+        [good_file, vendored, hidden, file_structure],
+    ]:
+        files = list(get_files(paths))
+        assert len(files) == len(expected)
+        assert set(files) == expected
+
+
+@pytest.mark.parametrize("use_default_excludes", [True, False])
+def test_get_files_default_excludes(
+    file_extension, file_structure, use_default_excludes
+):
+    vendored = file_structure / "node_modules" / "package"
+    os.makedirs(vendored)
+    with open(vendored / f"vendored.{file_extension}", "w") as f:
+        f.write("No comments!\n")
+    files = list(
+        get_files(
+            [file_structure],
+            default_excludes=DEFAULT_EXCLUDES if use_default_excludes else None,
+        )
+    )
+    assert (vendored / f"vendored.{file_extension}" in files) != use_default_excludes
+
+
+@pytest.mark.parametrize(
+    "pattern",
+    ["bad_*", "bad_file?", "**/bad_files/*", "bad_files/bad_file_*"],
+)
+def test_get_files_exclude_patterns(file_extension, file_structure, pattern):
+    if "/" in pattern:
+        pattern = f"{file_structure.as_posix()}/{pattern}"
+    files = get_files([file_structure], exclude=[pattern])
+    expected = [file_structure / f"{fname}.{file_extension}" for fname in good_fnames]
+    assert set(files) == set(expected)
+    for fname in bad_fnames:
+        bad_file = file_structure / "bad_files" / f"{fname}.{file_extension}"
+        assert list(get_files([bad_file], exclude=[pattern])) == []
+
+
+def test_get_files_git_index(file_extension, file_structure):
+    link = file_structure / f"link.{file_extension}"
+    try:
+        os.symlink(f"{good_fnames[1]}.{file_extension}", link)
+    except (OSError, NotImplementedError):
+        pytest.skip("Symlinks are not supported on this platform")
+    try:
+        subprocess.run(["git", "init", "-q", str(file_structure)], check=True)
+        subprocess.run(
+            ["git", "-C", str(file_structure), "add", link.name]
+            + [f"{fname}.{file_extension}" for fname in good_fnames],
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip("git is not available")
+    os.remove(file_structure / f"{good_fnames[0]}.{file_extension}")
+    files = get_files([file_structure], discovery="git")
+    expected = [
+        file_structure / f"{fname}.{file_extension}" for fname in good_fnames[1:]
+    ]
+    # Tracked symlinks are neither reported twice nor replaced by a fix.
+    assert sorted(files) == sorted(expected)
+    _main([file_structure], GOOD_AUTHOR, None, None, False, False, discovery="git")
+    assert link.is_symlink()
+
+
+def test_get_files_changed_since(file_extension, file_structure):
+    def git(*args):
+        subprocess.run(
+            [
+                "git",
+                "-C",
+                str(file_structure),
+                "-c",
+                "user.name=a",
+                "-c",
+                "user.email=a",
+            ]
+            + list(args),
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+
+    try:
+        git("init", "-q")
+        git("add", ".")
+        git("commit", "-q", "-m", "Initial commit")
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip("git is not available")
+    modified, staged, deleted = [
+        file_structure / f"{fname}.{file_extension}" for fname in good_fnames[:3]
+    ]
+    with open(modified, "a") as f:
+        f.write("\n")
+    with open(staged, "a") as f:
+        f.write("\n")
+    git("add", staged.name)
+    git("rm", "-q", deleted.name)
+    added = file_structure / "bad_files" / f"new.{file_extension}"
+    added.touch()
+    git("add", added.relative_to(file_structure).as_posix())
+
+    assert set(get_files([file_structure], changed_since="HEAD")) == {
+        modified,
+        staged,
+        added,
+    }
+    assert set(get_files([file_structure], staged=True)) == {staged, added}
+    assert list(get_files([file_structure / "bad_files"], staged=True)) == [added]
+    assert list(get_files([modified, staged], staged=True)) == [staged]
+    # The changes are listed once per directory of the given files.
+    with patch(
+        "head_of_apache.git.iter_changes", wraps=head_of_apache.git.iter_changes
+    ) as iter_changes:
+        given = [modified, staged, deleted, added, *file_structure.glob("*_year.*")]
+        assert list(get_files(given, changed_since="HEAD")) == [modified, staged, added]
+    assert iter_changes.call_count == 2
+    assert list(get_files([file_structure], staged=True, exclude=[added])) == [staged]
+    with pytest.raises(GitError):
+        list(get_files([file_structure], changed_since="not-a-revision"))
+
+
+def test_get_files_git_fallback(file_extension, file_structure):
+    assert set(get_files([file_structure], discovery="git")) == set(
+        get_files([file_structure])
+    )
+
+
+def test_get_files_ignore_files(file_extension, file_structure):
+    with open(file_structure / ".gitignore", "w") as f:
+        f.write(f"# Comment\nbad_files/\n*_year.{file_extension}\n")
+    with open(file_structure / ".dockerignore", "w") as f:
+        f.write(f"good_file_with_special_opening.{file_extension}\n")
+    os.makedirs(file_structure / "nested")
+    for fname in ["good_file_current_year", "good_file_old_year"]:
+        with open(file_structure / "nested" / f"{fname}.{file_extension}", "w") as f:
+            f.write("No comments!\n")
+    with open(file_structure / "nested" / ".gitignore", "w") as f:
+        f.write(f"!good_file_old_year.{file_extension}\n")
+    with open(file_structure / "nested" / ".dockerignore", "w") as f:
+        f.write(f"/good_file_current_year.{file_extension}\n")
+
+    files = get_files([file_structure], ignore_files=[".gitignore"])
+    expected = {
+        file_structure / f"{fname}.{file_extension}"
+        for fname in good_fnames
+        if not fname.endswith("_year")
+    }
+    expected.add(file_structure / "nested" / f"good_file_old_year.{file_extension}")
+    assert set(files) == expected
+
+    files = get_files([file_structure], ignore_files=[".gitignore", ".dockerignore"])
+    expected.remove(file_structure / f"good_file_with_special_opening.{file_extension}")
+    assert set(files) == expected
+
+
+def make_synthetic_tree(root, depth, width=10, files_per_dir=20):
+    content = utils.good_file_old_to_current_year(**COMMENT_STYLES["hash"])
+    directories = [root]
+    for _ in range(depth):
+        directories = [
+            directory / f"dir_{i}" for directory in directories for i in range(width)
+        ]
+    for directory in directories:
+        os.makedirs(directory)
+        for i in range(files_per_dir):
+            with open(directory / f"file_{i}.py", "w") as f:
+                f.write(content)
+    return len(directories) * files_per_dir
+
+
+def test_constant_memory():
+    peaks = []
+    with tempfile.TemporaryDirectory() as tempdir:
+        for depth in [1, 2]:
+            root = pathlib.Path(tempdir) / f"depth_{depth}"
+            n_files = make_synthetic_tree(root, depth)
+            # Warm up the interpreter caches (e.g. interned path parts), which are
+            # not owned by head_of_apache.
+            for _ in get_files([root]):
+                pass
+            tracemalloc.start()
+            try:
+                assert sum(1 for _ in get_files([root])) == n_files
+                assert (
+                    _main(
+                        [root],
+                        author=GOOD_AUTHOR,
+                        mapping=None,
+                        exclude=None,
+                        dry_run=True,
+                        last_year_present=False,
+                        jobs=1,
+                    )
+                    == 0
+                )
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            peaks.append((n_files, peak))
+    (small_n_files, small_peak), (large_n_files, large_peak) = peaks
+    assert large_n_files == 10 * small_n_files
+    # The number of files grows tenfold, but the memory must not follow.
+    assert large_peak < 1.5 * small_peak
+
+
+def reference_validate_file_header(
+    first_line, current_year, author, last_year_present, start_year_override=None
+):
+    """The original implementation, with one regex search per notice form."""
+    license_notice = re.search(DESIRED_LICENSE_NOTICE, first_line)
+    if not license_notice:
+        license_notice = re.search(SINGLE_DATE_LICENSE_NOTICE, first_line)
+    if not license_notice or license_notice.group("author") != author:
+        start_year = start_year_override or current_year
+        end_year = current_year if not last_year_present else "present"
+        return False, True, start_year, end_year
+    start_year, end_year, wrong_space_format = parse_license_years(
+        license_notice.group("years")
+    )
+    if (
+        (end_year != current_year and not last_year_present)
+        or (end_year != "present" and last_year_present)
+        or (start_year_override is not None and start_year != start_year_override)
+    ):
+        start_year = start_year_override or start_year
+        end_year = current_year if not last_year_present else "present"
+        return True, True, start_year, end_year
+    return True, wrong_space_format, start_year, end_year
+
+
+HEADER_LINES = [
+    f"{prefix}Copyright {years} {author}{suffix}"
+    for prefix in ["", "# ", "<!-- ", "Copyright 1999 - 2000 other, "]
+    for years in [
+        "2023",
+        "2023 ",
+        "2023  ",
+        "2023-",
+        "2023 -",
+        "2023 - ",
+        f"2023 - {CURRENT_YEAR}",
+        f"2023-{CURRENT_YEAR}",
+        f"2023 -{CURRENT_YEAR}",
+        f"2023\t-  {CURRENT_YEAR}",
+        "2023 - present",
+        "2023-present",
+        "202",
+        "-",
+    ]
+    for author in [GOOD_AUTHOR, f"{GOOD_AUTHOR} and others", "1 person", ""]
+    for suffix in ["", "\n", " -->\n", "\nCopyright 2023 - present person"]
+] + ["", "\n", "No header\n", "Copyright\n"]
+
+
+@pytest.mark.parametrize("start_year_override", [None, "2023", "1998"])
+def test_header_matcher(last_year_present, start_year_override):
+    args = (str(CURRENT_YEAR), GOOD_AUTHOR, last_year_present, start_year_override)
+    expected = [reference_validate_file_header(line, *args) for line in HEADER_LINES]
+    assert [validate_file_header(line, *args) for line in HEADER_LINES] == expected
+    assert validate_headers(HEADER_LINES, *args) == expected
+
+
 def test_read_file_header_lines(single_file, comment_style):
     (path, expected_header, expected_first_line, expected_special_openning_lines) = (
         single_file
@@ -142,6 +451,138 @@ def test_read_file_header_lines(single_file, comment_style):
     assert special_openning_lines == expected_special_openning_lines
 
 
+class CountingReader(io.RawIOBase):
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self.raw.readinto(buffer)
+        self.bytes_read += n
+        return n
+
+
+def test_read_file_header_lines_is_bounded():
+    comment_style = COMMENT_STYLES["hash"]
+    bytes_read = []
+    with tempfile.TemporaryDirectory() as tempdir:
+        path = pathlib.Path(tempdir) / "foo.py"
+        for n_body_lines in [1_000, 10_000, 100_000]:
+            with open(path, "w") as f:
+                f.write(utils.good_file_current_year(**comment_style))
+                f.write("print('No comments!')\n" * n_body_lines)
+            with open(path, "rb", buffering=0) as raw:
+                reader = CountingReader(raw)
+                with io.TextIOWrapper(io.BufferedReader(reader), encoding="utf-8") as f:
+                    file_header, _, _ = read_file_header_lines(
+                        f, comment_style=comment_style, n_lines=LICENSE_LENGTH
+                    )
+                    assert len(file_header) == LICENSE_LENGTH
+                    bytes_read.append(reader.bytes_read)
+        assert bytes_read[0] < os.path.getsize(path)
+    assert len(set(bytes_read)) == 1
+
+
+@pytest.mark.parametrize(
+    "content, binary",
+    [
+        (b"\x7fELF\x02\x01\x01\x00\x00", True),
+        ("# Copyright 2023 - present person\n".encode("utf-16"), True),
+        ("# Copyright 2023 - present person\n".encode("utf-32"), True),
+        ("# Año\n".encode("latin-1"), False),
+        ("\ufeff# Año\n".encode("utf-8"), False),
+    ],
+)
+def test_binary_files(content, binary, capsys):
+    assert looks_binary(content) == binary
+    with tempfile.TemporaryDirectory() as tempdir:
+        path = pathlib.Path(tempdir) / "file.py"
+        with open(path, "wb") as f:
+            f.write(content)
+        exit_status = _main([path], GOOD_AUTHOR, None, None, False, False)
+        with open(path, "rb") as f:
+            new_content = f.read()
+    if binary:
+        assert exit_status == 0
+        assert capsys.readouterr().out == ""
+        assert new_content == content
+    else:
+        # Files that are not valid UTF-8 are never decoded.
+        assert exit_status == 1
+        assert new_content.endswith(b"\n" + content)
+
+
+@pytest.mark.parametrize("dry_run", [True, False])
+def test_crlf_files(dry_run, capsys):
+    # Files with Windows line endings are checked like the same files with Unix
+    # line endings, and the lines of the written headers end like theirs.
+    with tempfile.TemporaryDirectory() as tempdir:
+        outputs = {}
+        contents = {}
+        for newline in ["\n", "\r\n"]:
+            directory = pathlib.Path(tempdir) / repr(newline)
+            directory.mkdir()
+            for fname in good_fnames + bad_fnames:
+                content = getattr(utils, fname)(**COMMENT_STYLES["hash"])
+                with open(directory / f"{fname}.py", "wb") as f:
+                    f.write(content.replace("\n", newline).encode())
+            exit_status = _main([directory], GOOD_AUTHOR, None, None, dry_run, False)
+            output = capsys.readouterr().out.replace(str(directory), "")
+            outputs[newline] = exit_status, sorted(output.splitlines())
+            contents[newline] = {}
+            for path in directory.iterdir():
+                with open(path, "rb") as f:
+                    contents[newline][path.name] = f.read()
+    assert outputs["\r\n"] == outputs["\n"]
+    assert (
+        "No license header found in '/good_file_current_year.py'."
+        not in (outputs["\n"][1])
+    )
+    for name, content in contents["\n"].items():
+        assert contents["\r\n"][name] == content.replace(b"\n", b"\r\n")
+
+
+@pytest.mark.parametrize("minified", MINIFIED_POLICIES)
+@pytest.mark.parametrize("fname", ["bundle.min.js", "bundle.js", "generated.js"])
+def test_minified_files(minified, fname, capsys):
+    with tempfile.TemporaryDirectory() as tempdir:
+        path = pathlib.Path(tempdir) / fname
+        with open(path, "w") as f:
+            if fname == "generated.js":
+                f.write("// @generated by a tool\n")
+            f.write("var a=1;" * 1_000_000)
+        with open(path, "rb", buffering=0) as raw:
+            reader = CountingReader(raw)
+            with io.TextIOWrapper(io.BufferedReader(reader), encoding="utf-8") as f:
+                file_header, first_line, _ = read_file_header_lines(
+                    f, comment_style=COMMENT_STYLES["asterisk"], n_lines=LICENSE_LENGTH
+                )
+        assert reader.bytes_read < 2 * MAX_LINE_LENGTH + 8192
+        assert len(first_line) <= MAX_LINE_LENGTH
+        assert looks_minified(path, file_header)
+
+        exit_status = _main(
+            [path],
+            author=GOOD_AUTHOR,
+            mapping=None,
+            exclude=None,
+            dry_run=True,
+            last_year_present=False,
+            minified=minified,
+        )
+    captured = capsys.readouterr()
+    assert exit_status == (1 if minified == "insert" else 0)
+    if minified == "insert":
+        assert "No license header found" in captured.out
+    elif minified == "warn":
+        assert "Skipping minified or generated file" in captured.out
+    else:
+        assert not captured.out
+
+
 def test_main(single_file, comment_style, last_year_present, dry_run, capsys):
     path, *_ = single_file
     if dry_run:
@@ -211,6 +652,101 @@ def test_main(single_file, comment_style, last_year_present, dry_run, capsys):
             assert not must_update_license_notice
 
 
+@pytest.mark.parametrize(
+    "year", [f"2023 - {CURRENT_YEAR - 1}", f"2023-{CURRENT_YEAR}", "2023 - present"]
+)
+def test_main_patches_in_place(file_extension, comment_style, year):
+    content = get_license_header(GOOD_AUTHOR, year, **comment_style) + "\nBody\n"
+    if file_extension == "py":
+        content = "#!/bin/python\n" + content
+    outputs = []
+    for patch_in_place in [True, False]:
+        with tempfile.TemporaryDirectory() as tempdir:
+            path = pathlib.Path(tempdir) / f"file.{file_extension}"
+            with open(path, "w") as f:
+                f.write(content)
+            inode = os.stat(path).st_ino
+            with patch(
+                "head_of_apache.main._patch_header",
+                side_effect=None if patch_in_place else lambda *args: False,
+                wraps=head_of_apache.main._patch_header,
+            ):
+                _main([path], GOOD_AUTHOR, None, None, False, False)
+            with open(path) as f:
+                outputs.append(f.read())
+            if patch_in_place:
+                # Only a same size header is patched without replacing the file.
+                assert (os.stat(path).st_ino == inode) == (len(year) == 11)
+    assert outputs[0] == outputs[1]
+    assert f"Copyright 2023 - {CURRENT_YEAR} {GOOD_AUTHOR}" in outputs[0]
+
+
+def test_main_patches_long_lines(capsys):
+    # A line of the old header that is longer than MAX_LINE_LENGTH is cut while
+    # reading the header to patch.
+    content = f"#   Copyright 2023 - {CURRENT_YEAR - 1} {GOOD_AUTHOR}\n"
+    content += "#" * (MAX_LINE_LENGTH + 1000) + "\nBody\n"
+    with tempfile.TemporaryDirectory() as tempdir:
+        path = pathlib.Path(tempdir) / "file.py"
+        with open(path, "w") as f:
+            f.write(content)
+        assert _main([path], GOOD_AUTHOR, None, None, False, False) == 1
+        with open(path) as f:
+            new_content = f.read()
+    assert capsys.readouterr().out == f"Updated license header in '{path}'.\n"
+    assert new_content.startswith(
+        get_license_header(
+            GOOD_AUTHOR, f"2023 - {CURRENT_YEAR}", **COMMENT_STYLES["hash"]
+        )
+    )
+
+
+@pytest.mark.parametrize(
+    "copy_function", head_of_apache.main._COPY_FUNCTIONS, ids=lambda f: f.__name__
+)
+def test_main_streams_body(copy_function, capsys):
+    comment_style = COMMENT_STYLES["hash"]
+    old_header = get_license_header(GOOD_AUTHOR, "2023", **comment_style)
+    # The body is never decoded, and its line endings are kept.
+    body = b"x = 1\r\n" * 100_000 + b"# \xff\xfe\n" + b"y" * 3_000_000
+    expected_header = get_license_header(
+        GOOD_AUTHOR, f"2023 - {CURRENT_YEAR}", **comment_style
+    )
+    with tempfile.TemporaryDirectory() as tempdir:
+        path = pathlib.Path(tempdir) / "file.py"
+        with open(path, "wb") as f:
+            f.write(b"#!/bin/python\n" + old_header.encode() + b"\n" + body)
+        with patch("head_of_apache.main._COPY_FUNCTIONS", [copy_function]):
+            assert _main([path], GOOD_AUTHOR, None, None, False, False) == 1
+        with open(path, "rb") as f:
+            content = f.read()
+    assert capsys.readouterr().out == f"Updated license header in '{path}'.\n"
+    expected_header = (expected_header + "\n").replace("\n", os.linesep).encode()
+    assert content == b"#!/bin/python\n" + expected_header + body
+
+
+@pytest.mark.parametrize("process_pool_min_files", [1, 1000])
+def test_main_jobs(file_structure, dry_run, process_pool_min_files, capsys):
+    outputs = []
+    with patch("head_of_apache.main.PROCESS_POOL_MIN_FILES", process_pool_min_files):
+        for jobs in [1, 4]:
+            with tempfile.TemporaryDirectory() as tempdir:
+                shutil.copytree(file_structure, tempdir, dirs_exist_ok=True)
+                exit_status = _main(
+                    [tempdir],
+                    author=GOOD_AUTHOR,
+                    mapping=None,
+                    exclude=None,
+                    dry_run=dry_run,
+                    last_year_present=False,
+                    jobs=jobs,
+                )
+                output = capsys.readouterr().out.replace(tempdir, "")
+            outputs.append((exit_status, output))
+    assert outputs[0] == outputs[1]
+    assert outputs[0][0] == 1
+
+
 def test_start_year_override(start_year_override):
     comment_style = COMMENT_STYLES[FILE_TYPE_MAPPING["py"]]
     file_content = utils.good_file_old_to_current_year(**comment_style)
@@ -270,6 +806,18 @@ def test_cli(
         dry_run,
         last_year_present,
         start_year_override=start_year_override,
+        use_default_excludes=True,
+        discovery="walk",
+        ignore_files=None,
+        minified="insert",
+        jobs=None,
+        pipeline=False,
+        cache_dir=pathlib.Path(DEFAULT_CACHE_DIR),
+        shared_cache_dir=None,
+        shared_cache_read_only=False,
+        changed_since=None,
+        staged=False,
+        stats=None,
     )
 
 
@@ -0,0 +1,99 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import asyncio
+import io
+import shutil
+import tempfile
+from unittest.mock import patch
+
+import pytest
+
+from head_of_apache import pipeline
+from head_of_apache.main import _main, main
+
+from .utils import GOOD_AUTHOR, bad_fnames, good_fnames
+
+# Nested directories with files of two comment styles.
+pytestmark = pytest.mark.parametrize(
+    "workspace", [[("py", "hash"), ("html", "html")]], indirect=True
+)
+
+
+@pytest.fixture(params=["dry_run", "real_run"])
+def dry_run(request):
+    return request.param == "dry_run"
+
+
+def test_pipeline_matches_main(workspace, dry_run, capsys):
+    outputs = []
+    for use_pipeline in [False, True]:
+        with tempfile.TemporaryDirectory() as tempdir:
+            shutil.copytree(workspace, tempdir, dirs_exist_ok=True)
+            exit_status = _main(
+                [tempdir],
+                author=GOOD_AUTHOR,
+                mapping=None,
+                exclude=None,
+                dry_run=dry_run,
+                last_year_present=False,
+                pipeline=use_pipeline,
+            )
+            output = capsys.readouterr().out.replace(tempdir, "")
+        outputs.append((exit_status, output))
+    assert outputs[0] == outputs[1]
+    assert outputs[0][0] == 1
+
+
+def test_pipeline_in_running_loop(workspace):
+    async def collect():
+        results = []
+        async for result in pipeline.iter_results(
+            [workspace], GOOD_AUTHOR, dry_run=True, queue_size=2, jobs=2
+        ):
+            results.append(result)
+        return results
+
+    with patch.object(pipeline, "DISCOVERY_BATCH_SIZE", 3):
+        results = asyncio.run(collect())
+    assert len(results) == 2 * len(good_fnames + bad_fnames)
+    failed = {result.file.stem for result in results if result.exit_status}
+    assert set(bad_fnames) <= failed
+
+    output = io.StringIO()
+    exit_status = asyncio.run(
+        pipeline.run([workspace], GOOD_AUTHOR, dry_run=True, output=output)
+    )
+    assert exit_status == 1
+    assert output.getvalue().count("\n") == sum(
+        len(result.messages) for result in results
+    )
+
+
+def test_pipeline_default_jobs(workspace, capsys):
+    args = ["-a", GOOD_AUTHOR, "--dry-run", "--pipeline", str(workspace)]
+    assert main(args) == 1
+    expected = capsys.readouterr().out
+    # 0 jobs stands for the default number of workers, as without the pipeline.
+    assert main(["--jobs", "0", *args]) == 1
+    assert capsys.readouterr().out == expected
+
+
+def test_pipeline_propagates_errors(workspace):
+    async def consume():
+        async for _ in pipeline.iter_results([workspace], GOOD_AUTHOR):
+            pass
+
+    with patch.object(pipeline, "_check_file", side_effect=PermissionError):
+        with pytest.raises(PermissionError):
+            asyncio.run(consume())
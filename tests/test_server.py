@@ -0,0 +1,179 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import os
+import socket
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from head_of_apache import client
+from head_of_apache.main import _check_file, _main, main
+from head_of_apache.server import InotifyWatcher, PollingWatcher, Server
+
+from .utils import GOOD_AUTHOR, good_fnames
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="Unix sockets are not available"
+)
+
+WATCHERS = [PollingWatcher]
+if InotifyWatcher.available():
+    WATCHERS.append(InotifyWatcher)
+
+
+@pytest.fixture(params=WATCHERS)
+def server(request, workspace):
+    return Server([workspace / "src"], GOOD_AUTHOR, jobs=1, watcher=request.param())
+
+
+def expected(workspace, dry_run):
+    """The exit status and messages of a normal run over the workspace."""
+    with patch("sys.stdout.write") as write:
+        status = _main(
+            [workspace / "src"],
+            author=GOOD_AUTHOR,
+            mapping=None,
+            exclude=None,
+            dry_run=dry_run,
+            last_year_present=False,
+            jobs=1,
+        )
+    output = "".join(call.args[0] for call in write.call_args_list)
+    return status, output.splitlines()
+
+
+def count_checks():
+    return patch("head_of_apache.main._check_file", side_effect=_check_file)
+
+
+def test_server_check(workspace, server):
+    dry_run_result = expected(workspace, dry_run=True)
+    assert server.check(dry_run=True) == dry_run_result
+    with count_checks() as check:
+        assert server.check(dry_run=True) == dry_run_result
+    assert check.call_count == 0
+
+    # Only the changed file is checked again.
+    changed = workspace / "src" / f"{good_fnames[0]}.py"
+    with open(changed, "a") as f:
+        f.write("\n")
+    with count_checks() as check:
+        server.check(dry_run=True)
+    assert [call.args[0] for call in check.call_args_list] == [changed]
+
+    status, messages = server.check()
+    assert status == 1 and messages
+    assert server.check() == (0, [])
+
+
+def test_server_tree_changes(workspace, server):
+    server.check()
+    new_directory = workspace / "src" / "new"
+    new_directory.mkdir()
+    added = new_directory / "added.py"
+    with open(added, "w") as f:
+        f.write("print('hello')\n")
+    assert server.check(dry_run=True) == (
+        1,
+        [f"No license header found in '{added}'."],
+    )
+    os.remove(added)
+    os.remove(workspace / "src" / f"{good_fnames[0]}.py")
+    assert server.check(dry_run=True) == (0, [])
+
+
+def test_server_paths(workspace, server):
+    sub = workspace / "src" / "sub"
+    status, messages = server.check([sub], dry_run=True)
+    assert status == 1
+    assert messages == [
+        message
+        for message in expected(workspace, dry_run=True)[1]
+        if f"'{sub}{os.sep}" in message
+    ]
+    file = workspace / "src" / f"{good_fnames[0]}.py"
+    status, messages = server.check([file])
+    assert all(f"'{file}'" in message for message in messages)
+    assert server.check([file]) == (0, [])
+
+    # Directories outside of the served ones are searched.
+    other = workspace / "other"
+    other.mkdir()
+    with open(other / "c.py", "w") as f:
+        f.write("print('c')\n")
+    assert server.check([other], dry_run=True) == (
+        1,
+        [f"No license header found in '{other / 'c.py'}'."],
+    )
+    status, messages = server.check([workspace], dry_run=True)
+    assert f"No license header found in '{other / 'c.py'}'." in messages
+    assert len(messages) == len(expected(workspace, dry_run=True)[1]) + 1
+
+
+def test_client(workspace, capsys):
+    socket_path = workspace / "server.sock"
+    server = Server([workspace / "src"], GOOD_AUTHOR, jobs=1)
+    ready = threading.Event()
+    thread = threading.Thread(
+        target=server.serve, args=(socket_path,), kwargs={"ready": ready.set}
+    )
+    thread.start()
+    try:
+        assert ready.wait(10)
+        status, messages = expected(workspace, dry_run=True)
+        assert client.main(["--socket", str(socket_path), "-d"]) == status
+        assert capsys.readouterr().out.splitlines() == messages
+        with pytest.raises(client.ServerError):
+            client.request(socket_path, "unknown")
+    finally:
+        client.request(socket_path, "stop")
+        thread.join(10)
+    assert not thread.is_alive()
+    assert not socket_path.exists()
+    assert client.main(["--socket", str(socket_path)]) == 2
+    assert "Could not reach" in capsys.readouterr().err
+
+
+def test_serve_socket_path(workspace):
+    socket_path = workspace / "server.sock"
+    with open(socket_path, "w") as f:
+        f.write("Not a socket\n")
+    server = Server([workspace / "src"], GOOD_AUTHOR, jobs=1)
+    with pytest.raises(FileExistsError, match="not a socket"):
+        server.serve(socket_path)
+    with pytest.raises(SystemExit):
+        main(["-a", GOOD_AUTHOR, "--serve", "--socket", str(socket_path)])
+    assert socket_path.read_text() == "Not a socket\n"
+    os.remove(socket_path)
+
+    # The socket of a server that did not stop cleanly is replaced.
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stale:
+        stale.bind(os.fspath(socket_path))
+    ready = threading.Event()
+    thread = threading.Thread(
+        target=server.serve, args=(socket_path,), kwargs={"ready": ready.set}
+    )
+    thread.start()
+    try:
+        assert ready.wait(10)
+        # The socket of a running server is not taken over.
+        other = Server([workspace / "src"], GOOD_AUTHOR, jobs=1)
+        with pytest.raises(FileExistsError, match="already listening"):
+            other.serve(socket_path)
+        assert client.request(socket_path, paths=[], dry_run=True)
+    finally:
+        client.request(socket_path, "stop")
+        thread.join(10)
+    assert not socket_path.exists()
@@ -0,0 +1,98 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import json
+import pickle
+from unittest.mock import patch
+
+import pytest
+
+from head_of_apache.main import main
+from head_of_apache.stats import PHASES, FileTimer, Stats
+
+from .utils import GOOD_AUTHOR, bad_fnames, good_fnames
+
+
+def run_with_stats(workspace, *args):
+    output = workspace / "stats.json"
+    main(
+        [
+            "--author",
+            GOOD_AUTHOR,
+            "--no-cache",
+            "--stats-json",
+            str(output),
+            *args,
+            str(workspace / "src"),
+        ]
+    )
+    with open(output) as f:
+        return json.load(f)
+
+
+def test_stats_json(workspace, capsys):
+    with open(workspace / "src" / "image.py", "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n\0\0\0\rIHDR")
+    checked = run_with_stats(workspace, "--dry-run", "--jobs", "1")
+    counters = checked["counters"]
+    assert counters["scanned"] == len(good_fnames + bad_fnames) + 1
+    assert counters["binary"] == 1
+    assert counters["missing"] > 0 and counters["outdated"] > 0
+    assert counters["inserted"] == counters["updated"] == 0
+    assert counters["bytes_written"] == 0
+    outcomes = ["ok", "missing", "outdated", "binary"]
+    assert sum(counters[name] for name in outcomes) == counters["scanned"]
+    assert set(checked["phases"]) == set(PHASES)
+    assert checked["phases"]["rewrite"]["wall_time"] == 0
+    assert len(checked["slowest_files"]) == 10
+    times = [entry["wall_time"] for entry in checked["slowest_files"]]
+    assert times == sorted(times, reverse=True)
+
+    fixed = run_with_stats(workspace, "--jobs", "2")["counters"]
+    assert fixed["inserted"] == counters["missing"]
+    assert fixed["updated"] == counters["outdated"]
+    assert fixed["bytes_written"] > 0
+    assert fixed["bytes_read"] >= counters["bytes_read"]
+    captured = capsys.readouterr()
+    assert "Slowest files" not in captured.err
+
+
+def test_stats_report(workspace, capsys):
+    main(["--author", GOOD_AUTHOR, "--no-cache", "--stats", str(workspace / "src")])
+    captured = capsys.readouterr()
+    assert "Applied license header" in captured.out
+    assert "Slowest files:" in captured.err
+    for phase in PHASES:
+        assert phase in captured.err
+
+
+@pytest.mark.parametrize("mode", ["--pipeline", "--serve"])
+@pytest.mark.parametrize("option", [["--stats"], ["--stats-json", "stats.json"]])
+def test_stats_unsupported_modes(workspace, mode, option):
+    with patch("head_of_apache.server.Server.serve") as serve:
+        with pytest.raises(SystemExit):
+            main(["--author", GOOD_AUTHOR, *option, mode, str(workspace)])
+    serve.assert_not_called()
+
+
+def test_file_timer():
+    stats = Stats(slowest=2)
+    for name, wall in [("a", 3.0), ("b", 1.0), ("c", 2.0)]:
+        timer = FileTimer()
+        timer.phases["read"] = (wall, 0.5)
+        timer.action = "inserted"
+        stats.add_file(name, pickle.loads(pickle.dumps(timer)))
+    assert stats.slowest_files() == [(3.0, "a"), (2.0, "c")]
+    assert stats.phases["read"] == [6.0, 1.5]
+    assert stats.counters["inserted"] == 3
+    assert list(stats.timed(range(3), "discovery")) == [0, 1, 2]
@@ -0,0 +1,122 @@
+#   Copyright 2026 - present Luciano Paz
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import json
+from unittest.mock import patch
+
+import pytest
+
+from head_of_apache import trace
+from head_of_apache.main import _main, _process_file, main
+
+from .utils import GOOD_AUTHOR, bad_fnames, good_fnames
+
+
+def test_chrome_trace(workspace, capsys):
+    output = workspace / "trace.json"
+    main(
+        [
+            "--author",
+            GOOD_AUTHOR,
+            "--no-cache",
+            "--jobs",
+            "2",
+            "--trace",
+            str(output),
+            str(workspace / "src"),
+        ]
+    )
+    assert not trace.enabled()
+    with open(output) as f:
+        events = json.load(f)
+    spans = [event for event in events if event["ph"] == "X"]
+    directories = [
+        span["args"]["directory"] for span in spans if span["cat"] == "discovery"
+    ]
+    assert directories == [str(workspace / "src"), str(workspace / "src" / "sub")]
+    checks = [span for span in spans if span["name"] == "check"]
+    assert len(checks) == len(good_fnames + bad_fnames)
+    rewrites = [span for span in spans if span["name"] == "rewrite"]
+    assert len(rewrites) == capsys.readouterr().out.count("license header")
+    for span in spans:
+        assert span["dur"] >= 0
+    tracks = {(event["pid"], event["tid"]) for event in spans}
+    names = {(event["pid"], event["tid"]) for event in events if event["ph"] == "M"}
+    assert tracks == names
+
+
+def test_subscribe(workspace):
+    spans = []
+    trace.subscribe(spans.append)
+    try:
+        _main(
+            [workspace / "src"],
+            author=GOOD_AUTHOR,
+            mapping=None,
+            exclude=None,
+            dry_run=True,
+            last_year_present=False,
+            jobs=1,
+        )
+        with trace.span("custom", "test", value=1):
+            pass
+        assert spans.pop().args == {"value": 1}
+    finally:
+        trace.unsubscribe(spans.append)
+    checked = {span.args["file"] for span in spans if span.name == "check"}
+    assert len(checked) == len(good_fnames + bad_fnames)
+    assert {span.name for span in spans if span.category == "file"} == {
+        "check",
+        "read",
+        "validate",
+    }
+    # Spans are not published anymore after unsubscribing.
+    n_spans = len(spans)
+    with trace.span("custom", "test", value=1):
+        pass
+    assert len(spans) == n_spans
+
+
+def test_no_subscribers(workspace):
+    # Without subscribers nor statistics, files are processed without any timer.
+    results = []
+
+    def process_file(task):
+        results.append(_process_file(task))
+        return results[-1]
+
+    with patch("head_of_apache.main._process_file", side_effect=process_file):
+        _main(
+            [workspace / "src"],
+            author=GOOD_AUTHOR,
+            mapping=None,
+            exclude=None,
+            dry_run=True,
+            last_year_present=False,
+            jobs=1,
+        )
+    assert len(results) == len(good_fnames + bad_fnames)
+    assert all(result.timer is None for result in results)
+
+
+@pytest.mark.parametrize("mode", ["--pipeline", "--serve"])
+def test_trace_unsupported_modes(workspace, mode):
+    output = workspace / "trace.json"
+    with patch("head_of_apache.server.Server.serve") as serve:
+        with pytest.raises(SystemExit):
+            main(
+                ["--author", GOOD_AUTHOR, "--trace", str(output), mode, str(workspace)]
+            )
+    serve.assert_not_called()
+    assert not output.exists()
+    assert not trace.enabled()